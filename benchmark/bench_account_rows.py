@@ -0,0 +1,89 @@
+"""
+Microbenchmark for mapping accounts rows to Account objects.
+
+Compares the previous path (row -> temporary dict -> json.loads -> Account.from_dict
+on a __dict__-backed class) with Account.from_row (slotted, cookies decoded lazily).
+
+Usage: python -m benchmark.bench_account_rows [rows]
+"""
+import json
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+from model.DataModel import ACCOUNT_COLUMNS, Account
+
+class LegacyAccount:
+    def __init__(self, discord_user_id, discord_guild_id, username="", cookies={ }, timestamp=0, good=False, autosign=False):
+        self.discord_user_id = discord_user_id
+        self.discord_guild_id = discord_guild_id
+        self.username = username
+        self.cookies = cookies or {}
+        self.timestamp = timestamp
+        self.good = good
+        self.autosign = autosign
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            discord_user_id=data.get("discordUserId"),
+            discord_guild_id=data.get("discordGuildId"),
+            username=data.get("name", ""),
+            cookies=data.get("cookies", {}),
+            timestamp=data.get("timestamp", 0),
+            good=data.get("good", False),
+            autosign=data.get("autosign", False),
+        )
+
+def legacy_map(row):
+    account_data = {
+        "discordUserId": row[1],
+        "discordGuildId": row[2],
+        "name": row[3],
+        "cookies": json.loads(row[4]),
+        "timestamp": row[5],
+        "good": bool(row[6]),
+        "autosign": bool(row[7])
+    }
+    return LegacyAccount.from_dict(account_data)
+
+def build_rows(count: int) -> list[tuple]:
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, discordUserId INTEGER, discordGuildId INTEGER,
+            username TEXT NOT NULL UNIQUE, cookies TEXT, timestamp INTEGER, good INTEGER, autosign INTEGER
+        )
+    """)
+    cookies = json.dumps({"EeqY_2132_auth": "a" * 111, "EeqY_2132_saltkey": "s" * 25})
+    conn.executemany(
+        "INSERT INTO accounts (discordUserId, discordGuildId, username, cookies, timestamp, good, autosign) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((10**17 + i, 10**17, f"user{i}", cookies, 1700000000, 1, 1) for i in range(count)),
+    )
+    rows = conn.execute(f"SELECT {ACCOUNT_COLUMNS} FROM accounts").fetchall()
+    conn.close()
+    return rows
+
+def measure(name: str, mapper, rows: list[tuple]):
+    start = time.perf_counter()
+    accounts = [mapper(row) for row in rows]
+    elapsed = time.perf_counter() - start
+    del accounts
+
+    tracemalloc.start()
+    accounts = [mapper(row) for row in rows]
+    current, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    # Touch the username only, as the sign engine's bookkeeping does.
+    _ = [account.username for account in accounts]
+
+    print(f"{name:<10} {elapsed / len(rows) * 1e9:>8.0f} ns/row  {current / len(rows):>7.0f} B/row  {blocks / len(rows):>6.2f} allocations/row  peak {peak / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rows = build_rows(count)
+    print(f"Mapping {count} accounts rows")
+    measure("legacy", legacy_map, rows)
+    measure("from_row", Account.from_row, rows)
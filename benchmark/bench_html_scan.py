@@ -0,0 +1,140 @@
+"""
+Microbenchmark for the page parsers of SignModel and LoginModel.
+
+Compares the previous path (read the whole body, decode it, run str regexes on it) with the
+streaming HtmlScanner (precompiled byte patterns, stops reading once the pattern it needs
+has matched) over the pages of benchmark.mock_yamibo. The mock pages only hold the part
+the bot reads, so they are wrapped in --header-kb / --footer-kb of forum navigation markup
+to reach the size of a live page. Bodies are fed in 16 KiB chunks, as aiohttp delivers them.
+
+Reports per page: microseconds per parse, bytes read, and peak memory allocated per parse.
+
+Usage: python -m benchmark.bench_html_scan [--iterations 2000] [--header-kb 40] [--footer-kb 60]
+"""
+import argparse
+import asyncio
+import re
+import time
+import tracemalloc
+
+import bot  # noqa: F401  imported first, the models import it back
+from benchmark import mock_yamibo
+from model.LoginModel import LOGIN_PAGE_PATTERNS, is_logged_out_page, parse_success_xml_to_text, welcome_text
+from model.ScanModel import CHUNK_SIZE, HtmlScanner, scan_chunks
+from model.SignModel import SIGN_PAGE_PATTERNS, SIGN_RESULT_PATTERNS
+
+NAV_ITEM = '<li class="a"><a href="forum-{i}-1.html" title="版块 {i}">版块 {i}</a><span class="xg1">今日: {i}</span></li>\n'
+
+def filler(size: int) -> str:
+    items = []
+    total = 0
+    i = 0
+    while total < size:
+        item = NAV_ITEM.format(i=i)
+        items.append(item)
+        total += len(item.encode("utf-8"))
+        i += 1
+    return "".join(items)
+
+def padded(page: str, header: int, footer: int) -> bytes:
+    """
+    `page` with navigation markup added after <body> and before </body>.
+    """
+    head, body = page.split("<body>", 1)
+    body, tail = body.rsplit("</body>", 1)
+    return (f"{head}<body>\n<div id=\"hd\"><ul>{filler(header)}</ul></div>\n{body}\n"
+            f"<div id=\"ft\"><ul>{filler(footer)}</ul></div>\n</body>{tail}").encode("utf-8")
+
+async def chunks_of(body: bytes):
+    for start in range(0, len(body), CHUNK_SIZE):
+        yield body[start:start + CHUNK_SIZE]
+
+async def read_all(body: bytes) -> bytes:
+    # What resp.text() does before decoding: collect every chunk.
+    return b"".join([chunk async for chunk in chunks_of(body)])
+
+"""
+PREVIOUS PARSERS
+"""
+
+async def legacy_sign_page(body: bytes):
+    text = (await read_all(body)).decode("utf-8")
+    if is_logged_out_page(text):
+        return "logged_out", len(body)
+    match = re.search(r'<a\s+href="([^"]+)"\s+class="btna">', text)
+    return (match.group(1) if match else None), len(body)
+
+async def legacy_sign_result(body: bytes):
+    text = (await read_all(body)).decode("utf-8")
+    match = re.search(r'<div\s+id="messagetext"[^>]*>.*?<p>(.*?)</p>', text, re.DOTALL)
+    return (match.group(1).strip().split("<script")[0] if match else None), len(body)
+
+async def legacy_login_page(body: bytes):
+    text = (await read_all(body)).decode("utf-8")
+    if is_logged_out_page(text):
+        return "logged_out", len(body)
+    return parse_success_xml_to_text(text)[1], len(body)
+
+"""
+STREAMING PARSERS
+"""
+
+async def scan_sign_page(body: bytes):
+    page = await scan_chunks(chunks_of(body), HtmlScanner(SIGN_PAGE_PATTERNS))
+    return ("logged_out" if "logged_out" in page else page.group("button", 1)), len(page.body)
+
+async def scan_sign_result(body: bytes):
+    page = await scan_chunks(chunks_of(body), HtmlScanner(SIGN_RESULT_PATTERNS))
+    message = page.group("message", 1)
+    return (message.strip().split("<script")[0] if message else None), len(page.body)
+
+async def scan_login_page(body: bytes):
+    page = await scan_chunks(chunks_of(body), HtmlScanner(LOGIN_PAGE_PATTERNS))
+    if "logged_out" in page:
+        return "logged_out", len(page.body)
+    return parse_success_xml_to_text(welcome_text(page))[1], len(page.body)
+
+CASES = (
+    ("sign page", mock_yamibo.SIGN_PAGE.format(sign_hash="1a2b3c4d"), legacy_sign_page, scan_sign_page),
+    ("sign page, guest", mock_yamibo.GUEST_PAGE, legacy_sign_page, scan_sign_page),
+    ("sign page, signed", mock_yamibo.SIGNED_PAGE, legacy_sign_page, scan_sign_page),
+    ("sign result", mock_yamibo.SIGN_RESULT_PAGE, legacy_sign_result, scan_sign_result),
+    ("login page", mock_yamibo.WELCOME_PAGE.format(username="thenano"), legacy_login_page, scan_login_page),
+)
+
+async def measure(parser, body: bytes, iterations: int) -> tuple[object, int, float, int]:
+    """
+    Returns:
+        (parse result, bytes read, microseconds per parse, peak bytes allocated by one parse)
+    """
+    result, read = await parser(body)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await parser(body)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    await parser(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, read, elapsed / iterations * 1e6, peak
+
+async def main(args: argparse.Namespace):
+    print(f"pages padded with {args.header_kb} KiB header + {args.footer_kb} KiB footer, {args.iterations} iterations")
+    print(f"{'page':<18} {'size':>8} {'parser':<9} {'us/parse':>9} {'bytes read':>11} {'peak alloc':>11}")
+    for name, page, legacy, streaming in CASES:
+        body = padded(page, args.header_kb * 1024, args.footer_kb * 1024)
+        results = []
+        for label, parser in (("previous", legacy), ("streaming", streaming)):
+            result, read, micros, peak = await measure(parser, body, args.iterations)
+            results.append(result)
+            print(f"{name:<18} {len(body) // 1024:>5} KiB {label:<9} {micros:>9.1f} {read:>11} {peak:>11}")
+        if results[0] != results[1]:
+            raise SystemExit(f"{name}: parsers disagree: {results[0]!r} != {results[1]!r}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the sign and login page parsers.")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--header-kb", type=int, default=40, help="Navigation markup before the content.")
+    parser.add_argument("--footer-kb", type=int, default=60, help="Markup after the content.")
+    asyncio.run(main(parser.parse_args()))
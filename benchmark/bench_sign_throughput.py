@@ -0,0 +1,265 @@
+"""
+End-to-end sign throughput against the local mock Yamibo server.
+
+For every account count the suite starts a fresh worker process that points var's URLs at
+the mock, seeds a scratch database with synthetic autosign accounts and runs the service's
+own sign path (DailySignService.sign_accounts: keyset paging, SignEngine, rate limiter,
+shared HTTP client, sign ledger). A sample of password and cookie logins goes through the
+login models first. While the run is going, an interactive sign (what /sign does) is
+timed every --probe-interval seconds. Each worker reports accounts/sec, p50/p99 latency of
+a single sign attempt, the p50/p99 of the interactive probes and its peak RSS.
+
+Usage: python -m benchmark.bench_sign_throughput [--accounts 1000 10000 100000] [--concurrency 50]
+           [--latency 0.02] [--error-rate 0.01] [--cookie-validity 0.95] [--logins 200]
+           [--probe-interval 0.5] [--trace-dir DIR]
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentile(samples: list[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+def point_at(base_url: str):
+    """
+    Send every request the models make to `base_url` instead of bbs.yamibo.com.
+    """
+    import var
+    var.DOMAIN = base_url
+    var.LOGIN_URL = base_url + "member.php?mod=logging&action=login"
+    var.LOGIN_POST_URL = base_url + "member.php?mod=logging&action=login&loginsubmit=yes&inajax=1"
+    var.LOGIN_CHECK_URL = base_url + "forum-49-1.html"
+    var.SIGN_URL = base_url + "plugin.php?id=zqlj_sign"
+
+def seed_accounts(path: str, count: int):
+    from model.DataModel import SAVE_ACCOUNT_SQL, sign_slot
+
+    def rows():
+        for i in range(count):
+            username = f"bench{i}"
+            cookies = json.dumps({"EeqY_2132_auth": f"{username}.{os.urandom(40).hex()}", "EeqY_2132_saltkey": os.urandom(12).hex()})
+            yield 10**17 + i, 10**17 + i % 50, username, cookies, int(time.time()), 1, 1, sign_slot(username)
+
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany(SAVE_ACCOUNT_SQL, rows())
+    conn.close()
+
+async def timed_logins(count: int, concurrency: int) -> dict:
+    """
+    Log `count` users in by password, then again with the cookies they got.
+    """
+    from benchmark.mock_yamibo import PASSWORD
+    from model.LoginModel import YamiboLogin_Cookie, YamiboLogin_Password
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(login) -> tuple[float, bool, dict]:
+        async with semaphore:
+            start = time.perf_counter()
+            _, account = await login.login()
+            return time.perf_counter() - start, account.good, account.cookies
+
+    results = {}
+    start = time.perf_counter()
+    password_runs = await asyncio.gather(*(
+        timed(YamiboLogin_Password(i, 0, f"login{i}", PASSWORD, "0", "")) for i in range(count)
+    ))
+    results["password"] = summarize([latency for latency, _, _ in password_runs], time.perf_counter() - start,
+                                    sum(good for _, good, _ in password_runs))
+
+    start = time.perf_counter()
+    cookie_runs = await asyncio.gather(*(
+        timed(YamiboLogin_Cookie(i, 0, f"login{i}", cookies.get("EeqY_2132_auth", ""), cookies.get("EeqY_2132_saltkey", "")))
+        for i, (_, good, cookies) in enumerate(password_runs) if good
+    ))
+    results["cookie"] = summarize([latency for latency, _, _ in cookie_runs], time.perf_counter() - start,
+                                  sum(good for _, good, _ in cookie_runs))
+    return results
+
+async def probe_interactive(interval: float, until: asyncio.Event) -> list[float]:
+    """
+    Sign one account in the interactive lane every `interval` seconds until `until` is set.
+    """
+    import bot
+    from model.DataModel import Account
+    from model.HttpModel import INTERACTIVE
+
+    latencies = []
+    while not until.is_set():
+        # A fresh account each time, so it has not signed yet today.
+        username = f"probe{len(latencies)}"
+        cookies = {"EeqY_2132_auth": f"{username}.{os.urandom(40).hex()}", "EeqY_2132_saltkey": os.urandom(12).hex()}
+        account = Account(0, 0, username, cookies, 0, True, True)
+        start = time.perf_counter()
+        await bot.sign_scheduler.sign(account, INTERACTIVE)
+        latencies.append(time.perf_counter() - start)
+        try:
+            await asyncio.wait_for(until.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+    return latencies
+
+def summarize(latencies: list[float], elapsed: float, success: int) -> dict:
+    return {
+        "count": len(latencies),
+        "success": success,
+        "per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+async def run_worker(args: argparse.Namespace) -> dict:
+    import bot
+    from model.DataModel import DataBase
+    from model.HttpModel import AdaptiveRateLimiter, HttpClient
+    from model.SignModel import SignModel
+    from model.TraceModel import run_tracer, tracing
+    from service.service_autosign import DailySignService
+    from service.service_sign_engine import SignStats
+
+    point_at(args.base_url)
+    bot.http_client = HttpClient(
+        limit_per_host=args.concurrency,
+        limiter=AdaptiveRateLimiter(rate=args.rate, min_rate=args.rate, max_rate=args.rate, max_concurrency=args.concurrency),
+        limited_host="127.0.0.1",
+    )
+
+    # Time every sign attempt, retries included, without changing what sign() does.
+    latencies: list[float] = []
+    sign = SignModel.sign
+
+    async def timed_sign(self):
+        start = time.perf_counter()
+        try:
+            return await sign(self)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    SignModel.sign = timed_sign
+
+    with tempfile.TemporaryDirectory() as folder:
+        bot.db = DataBase(folder)
+        await bot.db.create_table()
+        seed_accounts(bot.db.accounts_db, args.worker)
+        try:
+            logins = await timed_logins(args.logins, args.concurrency) if args.logins else {}
+            baseline_rss = peak_rss_mb()
+
+            service = DailySignService(bot=None)
+            service.concurrency = args.concurrency
+            service.sign_window = 0
+            sign_date = date.today().isoformat()
+            stats = SignStats(await bot.db.count_autosign_accounts(skip_signed_on=sign_date))
+
+            done = asyncio.Event()
+            probe = asyncio.create_task(probe_interactive(args.probe_interval, done)) if args.probe_interval else None
+            start = time.perf_counter()
+            with tracing(run_tracer(args.trace_dir, f"bench-{args.worker}")):
+                await service.sign_accounts(stats, sign_date)
+            elapsed = time.perf_counter() - start
+            done.set()
+            probes = await probe if probe else []
+        finally:
+            await bot.http_client.close()
+            await bot.db.close()
+
+    sign_stats = summarize(latencies, elapsed, stats.success)
+    return {
+        "accounts": stats.total,
+        "elapsed": elapsed,
+        "accounts_per_sec": stats.processed / elapsed if elapsed else 0.0,
+        "attempts": len(latencies),
+        "p50_ms": sign_stats["p50_ms"],
+        "p99_ms": sign_stats["p99_ms"],
+        "success": stats.success,
+        "failed": stats.failed,
+        "interactive_p50_ms": percentile(probes, 50) * 1000,
+        "interactive_p99_ms": percentile(probes, 99) * 1000,
+        "interactive_count": len(probes),
+        "baseline_rss_mb": baseline_rss,
+        "peak_rss_mb": peak_rss_mb(),
+        "limiter": bot.http_client.limiter.snapshot(),
+        "logins": logins,
+    }
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def run_suite(args: argparse.Namespace):
+    port = free_port()
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "benchmark.mock_yamibo", "--port", str(port), "--latency", str(args.latency),
+         "--error-rate", str(args.error_rate), "--cookie-validity", str(args.cookie_validity)],
+        cwd=PROJECT_ROOT, stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        print(mock.stdout.readline().strip())
+        print(f"latency {args.latency * 1000:.0f} ms | error rate {args.error_rate:.1%} | cookie validity {args.cookie_validity:.0%} | concurrency {args.concurrency}")
+        print(f"{'accounts':>9} {'accounts/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'attempts':>9} {'success':>8} {'failed':>7} {'peak RSS':>10} {'seconds':>8}")
+        for count in args.accounts:
+            worker = subprocess.run(
+                [sys.executable, "-m", "benchmark.bench_sign_throughput", "--worker", str(count),
+                 "--base-url", f"http://127.0.0.1:{port}/", "--concurrency", str(args.concurrency),
+                 "--rate", str(args.rate), "--probe-interval", str(args.probe_interval), "--logins", str(args.logins if count == args.accounts[0] else 0)]
+                + (["--trace-dir", args.trace_dir] if args.trace_dir else []),
+                cwd=PROJECT_ROOT, stdout=subprocess.PIPE, text=True, check=True,
+            )
+            result = json.loads(worker.stdout.strip().splitlines()[-1])
+            print(f"{result['accounts']:>9} {result['accounts_per_sec']:>11.1f} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                  f"{result['attempts']:>9} {result['success']:>8} {result['failed']:>7} {result['peak_rss_mb']:>7.1f} MB {result['elapsed']:>8.1f}")
+            if result["interactive_count"]:
+                print(f"  interactive sign during the run: {result['interactive_count']} probes, "
+                      f"p50 {result['interactive_p50_ms']:.1f} ms, p99 {result['interactive_p99_ms']:.1f} ms")
+            for kind, login in result["logins"].items():
+                print(f"  {kind} login: {login['count']} users, {login['per_sec']:.1f}/s, "
+                      f"p50 {login['p50_ms']:.1f} ms, p99 {login['p99_ms']:.1f} ms, {login['success']} succeeded")
+    finally:
+        mock.terminate()
+        mock.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the sign service against a local mock Yamibo.")
+    parser.add_argument("--accounts", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="Account counts to run.")
+    parser.add_argument("--concurrency", type=int, default=50, help="Signs in flight (and connections to the mock).")
+    parser.add_argument("--rate", type=float, default=1e6, help="Fixed rate limiter requests/sec; the default leaves it wide open.")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean mock response delay in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="Share of mock requests answered with 503.")
+    parser.add_argument("--cookie-validity", type=float, default=0.95, help="Share of seeded cookies the mock accepts.")
+    parser.add_argument("--logins", type=int, default=200, help="Password + cookie logins timed before the first run.")
+    parser.add_argument("--probe-interval", type=float, default=0.5, help="Seconds between interactive sign probes; 0 disables them.")
+    parser.add_argument("--trace-dir", help="Write a Chrome trace of each run to this folder.")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is None:
+        run_suite(args)
+    else:
+        # Keep the service's own log lines off stdout, which carries the result.
+        result_out, sys.stdout = sys.stdout, sys.stderr
+        result = asyncio.run(run_worker(args))
+        print(json.dumps(result), file=result_out)
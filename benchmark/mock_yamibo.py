@@ -0,0 +1,197 @@
+"""
+Local stand-in for the parts of bbs.yamibo.com the bot talks to.
+
+    GET  member.php?mod=logging&action=login          login form, or the welcome back page with valid cookies
+    POST member.php?mod=logging&action=login&loginsubmit=yes&inajax=1
+                                                      password login, sets EeqY_2132_auth on success
+    GET  plugin.php?id=zqlj_sign                      sign page with the "btna" link (guest page without valid cookies)
+    GET  plugin.php?id=zqlj_sign&sign=<hash>          sign result in <div id="messagetext">
+    GET  forum-49-1.html                              any forum page, for login checks
+
+Every request waits `latency` seconds (jittered by +-50%) and fails with a 503 with
+probability `error_rate`. Auth cookies issued by the mock's own login are always valid;
+any other auth cookie is valid for a stable `cookie_validity` share of its values.
+
+Usage: python -m benchmark.mock_yamibo [--port 8765] [--latency 0.02] [--error-rate 0.01] [--cookie-validity 0.95]
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import secrets
+from datetime import date
+
+from aiohttp import web
+
+AUTH_COOKIE = "EeqY_2132_auth"
+SALTKEY_COOKIE = "EeqY_2132_saltkey"
+PASSWORD = "password"
+# Prefix of auth cookies handed out by the mock's login; those never expire.
+ISSUED_PREFIX = "mock."
+
+GUEST_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>提示信息 - 百合会</title></head><body>
+<div id="messagetext" class="alert_info"><p>您需要先登录才能继续本操作</p></div>
+<form method="post" action="member.php?mod=logging&amp;action=login&amp;loginsubmit=yes">
+<input type="text" name="username" placeholder="用户名/Email/UID" />
+<input type="password" name="password" />
+</form>
+</body></html>"""
+
+WELCOME_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>百合会</title></head><body>
+<script type="text/javascript">$('succeedlocation').innerHTML = '欢迎您回来，<font color="#FF9900">百合花蕾</font> {username}，现在将转入登录前页面';</script>
+</body></html>"""
+
+LOGIN_OK_XML = """<?xml version="1.0" encoding="utf-8"?>
+<root><![CDATA[<script type="text/javascript" reload="1">$('succeedlocation').innerHTML = '欢迎您回来，<font color="#FF9900">百合花蕾</font> {username}，现在将转入登录前页面';</script>]]></root>"""
+
+LOGIN_FAILED_XML = """<?xml version="1.0" encoding="utf-8"?>
+<root><![CDATA[登录失败，您还可以尝试 4 次]]></root>"""
+
+SIGN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>每日打卡 - 百合会</title></head><body>
+<div class="wp"><div class="bm"><div class="bm_c">
+<a href="plugin.php?id=zqlj_sign&sign={sign_hash}" class="btna">点击打卡</a>
+</div></div></div>
+</body></html>"""
+
+SIGNED_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>每日打卡 - 百合会</title></head><body>
+<div class="wp"><div class="bm"><div class="bm_c"><span class="btnvisted">今日已打卡</span></div></div></div>
+</body></html>"""
+
+SIGN_RESULT_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>提示信息 - 百合会</title></head><body>
+<div id="messagetext" class="alert_right">
+<p>打卡成功，积分+1<script type="text/javascript" reload="1">setTimeout("window.location.href='plugin.php?id=zqlj_sign';", 3000);</script></p>
+</div>
+</body></html>"""
+
+FORUM_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>文學區 - 百合会</title></head><body><div id="threadlist"></div></body></html>"""
+
+class MockYamibo:
+    def __init__(self, latency: float = 0.02, error_rate: float = 0.01, cookie_validity: float = 0.95):
+        """
+        :param latency: Mean seconds every response is delayed.
+        :param error_rate: Share of requests answered with 503.
+        :param cookie_validity: Share of auth cookies (not issued by this mock) that are accepted.
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.cookie_validity = cookie_validity
+        # Auth cookie -> username, for everyone who logged in here.
+        self.sessions: dict[str, str] = {}
+        # Auth cookies that signed today.
+        self.signed: set[str] = set()
+        self.signed_on = date.today()
+        self.requests = 0
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.conditions])
+        app.router.add_get("/member.php", self.login_page)
+        app.router.add_post("/member.php", self.login_submit)
+        app.router.add_get("/plugin.php", self.sign_page)
+        app.router.add_get("/forum-49-1.html", self.forum_page)
+        return app
+
+    @web.middleware
+    async def conditions(self, request: web.Request, handler):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(random.uniform(self.latency / 2, self.latency * 1.5))
+        if random.random() < self.error_rate:
+            return web.Response(status=503, text="Service Unavailable")
+        return await handler(request)
+
+    def username_of(self, request: web.Request) -> str | None:
+        """
+        The user the request's cookies belong to, or None for a guest.
+        """
+        auth = request.cookies.get(AUTH_COOKIE)
+        if not auth:
+            return None
+        if auth in self.sessions:
+            return self.sessions[auth]
+        digest = int.from_bytes(hashlib.blake2b(auth.encode(), digest_size=8).digest(), "big")
+        if digest / 2 ** 64 >= self.cookie_validity:
+            return None
+        return auth.split(".", 1)[0]
+
+    @staticmethod
+    def html(text: str, **kwargs) -> web.Response:
+        return web.Response(text=text, content_type="text/html", charset="utf-8", **kwargs)
+
+    async def login_page(self, request: web.Request) -> web.Response:
+        username = self.username_of(request)
+        if username is None:
+            response = self.html(GUEST_PAGE)
+            response.set_cookie(SALTKEY_COOKIE, secrets.token_urlsafe(18)[:25])
+            return response
+        return self.html(WELCOME_PAGE.format(username=username))
+
+    async def login_submit(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        username = form.get("username", "")
+        if not username or form.get("password") != PASSWORD or SALTKEY_COOKIE not in request.cookies:
+            return web.Response(text=LOGIN_FAILED_XML, content_type="text/xml", charset="utf-8")
+
+        auth = ISSUED_PREFIX + secrets.token_urlsafe(80)
+        self.sessions[auth] = username
+        response = web.Response(text=LOGIN_OK_XML.format(username=username), content_type="text/xml", charset="utf-8")
+        response.set_cookie(AUTH_COOKIE, auth)
+        return response
+
+    async def sign_page(self, request: web.Request) -> web.Response:
+        if request.query.get("id") != "zqlj_sign":
+            raise web.HTTPNotFound()
+        username = self.username_of(request)
+        if username is None:
+            return self.html(GUEST_PAGE)
+
+        if self.signed_on != date.today():
+            self.signed.clear()
+            self.signed_on = date.today()
+        auth = request.cookies[AUTH_COOKIE]
+        if "sign" in request.query:
+            self.signed.add(auth)
+            return self.html(SIGN_RESULT_PAGE)
+        if auth in self.signed:
+            return self.html(SIGNED_PAGE)
+        return self.html(SIGN_PAGE.format(sign_hash=secrets.token_hex(4)))
+
+    async def forum_page(self, request: web.Request) -> web.Response:
+        if self.username_of(request) is None:
+            return self.html(GUEST_PAGE)
+        return self.html(FORUM_PAGE)
+
+async def serve(mock: MockYamibo, host: str = "127.0.0.1", port: int = 8765) -> web.AppRunner:
+    """
+    Start serving `mock` in the running event loop; clean up with `await runner.cleanup()`.
+    """
+    runner = web.AppRunner(mock.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+async def main(args: argparse.Namespace):
+    mock = MockYamibo(args.latency, args.error_rate, args.cookie_validity)
+    runner = await serve(mock, args.host, args.port)
+    print(f"[Mock] Serving Yamibo at http://{args.host}:{args.port}/", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for bbs.yamibo.com.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean response delay in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="Share of requests answered with 503.")
+    parser.add_argument("--cookie-validity", type=float, default=0.95, help="Share of stored auth cookies still accepted.")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -1,15 +1,70 @@
+import sys
+
+# Running `python bot.py` loads this file as __main__; alias it so `import bot`
+# elsewhere shares the same db/http_client instead of building a second copy.
+sys.modules.setdefault("bot", sys.modules[__name__])
+
 import discord
+import hashlib
+import json
 import os
+import time
 import var
 import asyncio
+from contextlib import contextmanager
+from urllib.parse import urlparse
 
 from discord.ext import commands
 from model.DataModel import DataBase
+from model.HttpModel import AdaptiveRateLimiter, HttpClient
+from model.MetricsModel import start_metrics_server
 from service import service_autosign
+from service.service_sign_engine import SignScheduler
+from service.service_supervisor import ServiceSupervisor
+
+@contextmanager
+def startup_phase(name: str):
+    """
+    Log how long one phase of startup takes.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        print(f"[Startup] {name}: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+class YamiboBot(commands.Bot):
+    """
+    Creates the autosign service once in setup_hook, not in on_ready, which Discord fires
+    again after every reconnect; a supervisor restarts it after a crash and stops it on close.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.autosign: service_autosign.DailySignService | None = None
+        self.autosign_supervisor: ServiceSupervisor | None = None
+
+    async def setup_hook(self):
+        with startup_phase("extension load"):
+            await load_extensions()
+        self.autosign = service_autosign.DailySignService(bot=self)
+        self.autosign_supervisor = ServiceSupervisor("autosign", self.autosign.start_service)
+        self.autosign_supervisor.start()
+
+    async def close(self):
+        if self.autosign_supervisor is not None:
+            await self.autosign_supervisor.stop()
+        await super().close()
 
 intents = discord.Intents.default()
-bot = commands.Bot(command_prefix="!", intents=intents)
-db = DataBase()
+bot = YamiboBot(command_prefix="!", intents=intents)
+db = DataBase(account_cache_size=var.ACCOUNT_CACHE_SIZE)
+http_client = HttpClient(
+    limit_per_host=var.HTTP_LIMIT_PER_HOST,
+    limiter=AdaptiveRateLimiter(max_concurrency=var.HTTP_LIMIT_PER_HOST, **var.AUTOSIGN_RATE_LIMIT),
+    limited_host=urlparse(var.DOMAIN).hostname,
+)
+# Every sign, /sign and autosign alike, goes through here to share http_client by priority lane.
+sign_scheduler = SignScheduler()
 
 async def load_extensions():
     for root, dirs, files in os.walk("./command"):
@@ -19,17 +74,41 @@ async def load_extensions():
                 await bot.load_extension(module_path)
                 print(f"Extension loaded: {module_path}")
 
+def command_tree_hash() -> str:
+    """
+    Hash of the global command tree in the form Discord receives it on sync, tied to the
+    application so a token for another bot still syncs.
+    """
+    payload = sorted((command.to_dict(bot.tree) for command in bot.tree.get_commands()),
+                     key=lambda command: (command["type"], command["name"]))
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8"))
+    return f"{bot.application_id}:{digest.hexdigest()}"
+
+async def sync_command_tree():
+    """
+    Sync the slash commands only when the tree differs from the last synced one, since
+    the sync is a slow, rate-limited global API call and on_ready runs on every reconnect.
+    """
+    tree_hash = command_tree_hash()
+    try:
+        with open(var.COMMAND_TREE_HASH_PATH) as file:
+            synced_hash = file.read().strip()
+    except FileNotFoundError:
+        synced_hash = None
+    if synced_hash == tree_hash:
+        print("[Startup] Command tree unchanged, sync skipped.")
+        return
+    await bot.tree.sync()
+    with open(var.COMMAND_TREE_HASH_PATH, "w") as file:
+        file.write(tree_hash)
+    print("[Startup] Command tree synced.")
+
 @bot.event
 async def on_ready():
-    await bot.tree.sync()
+    with startup_phase("command sync"):
+        await sync_command_tree()
     print(f"Logged in as {bot.user}")
     
-    """
-    Auto Sign Service
-    """
-    autosign = service_autosign.DailySignService(bot=bot)
-    asyncio.create_task(autosign.start_service())
-    
 @bot.event
 async def on_message(message: discord.Message):
     if bot.user.mentioned_in(message):
@@ -37,10 +116,18 @@ async def on_message(message: discord.Message):
     await bot.process_commands(message)
 
 async def launch():
-    await db.create_table()
-    async with bot:
-        await load_extensions()
-        await bot.start(var.BOT_TOKEN)
+    with startup_phase("database init"):
+        await db.create_table()
+    # Optional Prometheus endpoint, enabled by setting metrics_port in setup/config.yaml.
+    metrics_server = await start_metrics_server(var.METRICS_HOST, var.METRICS_PORT) if var.METRICS_PORT else None
+    try:
+        async with bot:
+            await bot.start(var.BOT_TOKEN)
+    finally:
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+        await http_client.close()
+        await db.close()
 
 if __name__ == "__main__":
     asyncio.run(launch())
\ No newline at end of file
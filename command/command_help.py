@@ -24,7 +24,12 @@ class HelpEmbed:
             value="启用自动打卡，登录后使用该指令即可启用。",
             inline=False
         )
-        
+        embed.add_field(
+            name="/stats",
+            value="查看连续打卡天数、成功率与最近一次失败原因。",
+            inline=False
+        )
+
         embed.set_footer(text="Dev thenano")
         return embed
 
@@ -15,7 +15,16 @@ class NotifyChannelCog(commands.Cog):
         )
         await interaction.response.send_message(embed=loading_embed)
         
-        await bot.db.save_notify_channels(interaction.guild.id,)
+        await bot.db.save_notify_channels({
+            "discordGuildId": interaction.guild.id,
+            "discordChannelId": interaction.channel.id,
+        })
+        result_embed = discord.Embed(
+            title="Channel set",
+            description=f"Daily sign results for this server will be sent to {interaction.channel.mention}.",
+            color=discord.Color.green()
+        )
+        await interaction.edit_original_response(embed=result_embed)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(NotifyChannelCog(bot))
\ No newline at end of file
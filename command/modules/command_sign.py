@@ -1,8 +1,9 @@
 import discord
+from datetime import date
 from discord.ext import commands
 import bot
-from model.SignModel import SignModel
 from model.DataModel import Account, DataBase
+from model.HttpModel import INTERACTIVE
 
 class SignCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -26,9 +27,9 @@ class SignCog(commands.Cog):
             )
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
-        sign_instance = SignModel(name=account.username, cookies=account.cookies)
-       
-        result = await sign_instance.sign()  # {"success": bool, "info": str}
+        # Ahead of any autosign run in progress, see SignScheduler.
+        result = await bot.sign_scheduler.sign(account, INTERACTIVE)  # {"success": bool, "info": str}
+        await bot.db.record_sign(account, date.today().isoformat(), result)
         
         if result.get("success"):
             result_embed = discord.Embed(
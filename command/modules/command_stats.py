@@ -0,0 +1,61 @@
+import discord
+from datetime import date, timedelta
+from discord.ext import commands
+import bot
+
+# Days of guild totals shown under the account's own stats.
+GUILD_STATS_DAYS = 7
+
+class StatsCog(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @discord.app_commands.command(name="stats", description="Show sign stats")
+    async def stats(self, interaction: discord.Interaction):
+        account = await bot.db.read_account_by_id(interaction.user.id)
+        if not account:
+            embed = discord.Embed(
+                title="Sign Stats",
+                description="No account found. Please log in using the /login command first.",
+                color=discord.Color.red()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        # Both lookups read the precomputed rollups, never the sign ledger.
+        today = date.today()
+        stats = await bot.db.get_account_stats(account.id, today.isoformat())
+        since = (today - timedelta(days=GUILD_STATS_DAYS - 1)).isoformat()
+        guild_days = await bot.db.get_guild_stats(account.discord_guild_id, since)
+
+        total_days = stats["success_days"] + stats["failed_days"]
+        embed = discord.Embed(
+            title="Sign Stats",
+            description=f"Account: {account.username}",
+            color=discord.Color.blue()
+        )
+        embed.add_field(name="Current Streak", value=f"{stats['streak']} days", inline=True)
+        embed.add_field(name="Best Streak", value=f"{stats['best_streak']} days", inline=True)
+        embed.add_field(
+            name="Success Rate",
+            value=f"{stats['success_days'] / total_days:.1%} ({stats['success_days']}/{total_days} days)" if total_days else "No signs yet",
+            inline=True
+        )
+        if stats["last_failure_date"]:
+            embed.add_field(
+                name="Last Failure",
+                value=f"{stats['last_failure_date']}: {stats['last_failure_message'] or 'Unknown reason'}"[:1024],
+                inline=False
+            )
+
+        success = sum(day_success for _, day_success, _ in guild_days)
+        failed = sum(day_failed for _, _, day_failed in guild_days)
+        embed.add_field(
+            name=f"This Server, Last {GUILD_STATS_DAYS} Days",
+            value=f"Success: {success} | Failed: {failed}",
+            inline=False
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(StatsCog(bot))
@@ -1,11 +1,48 @@
 import os
 import json
+import hashlib
+import time
+import asyncio
 import aiosqlite
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import AsyncIterator
+
+from model.MetricsModel import ACCOUNT_CACHE, DB_QUERY_SECONDS, timed
+
+# Accounts are spread over the daily sign window by a stable hash of their username.
+SIGN_SLOTS = 10000
+
+def sign_slot(username: str) -> int:
+    """
+    Deterministic position of an account in the sign window, in [0, SIGN_SLOTS).
+    """
+    digest = hashlib.blake2b(username.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % SIGN_SLOTS
+
+def shard_of(username: str, shards: int) -> int:
+    """
+    The shard in [0, shards) that owns an account, by jump consistent hashing of its username.
+    Going from N to N + 1 shards moves only about 1 / (N + 1) of the accounts.
+    """
+    if shards <= 1:
+        return 0
+    key = int.from_bytes(hashlib.blake2b(username.encode("utf-8"), digest_size=8, person=b"shard").digest(), "big")
+    bucket, jump = -1, 0
+    while jump < shards:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
 
 class Account:
     """
     Data structure representing a Yamibo account with associated Discord information.
+    Slotted to keep per-row overhead low; cookies loaded from the database stay as JSON
+    text until they are first read.
     """
+    __slots__ = ("id", "discord_user_id", "discord_guild_id", "username", "_cookies", "_cookies_json", "timestamp", "good", "autosign")
+
     def __init__(self, discord_user_id, discord_guild_id, username="", cookies={ }, timestamp=0, good=False, autosign=False):
         """
         Initialize an Account object.
@@ -17,13 +54,57 @@ class Account:
         :param timestamp: Unix timestamp of when the account was created/updated
         :param good: Boolean indicating if the account is valid
         """
+        self.id = None
         self.discord_user_id = discord_user_id
         self.discord_guild_id = discord_guild_id
         self.username = username
-        self.cookies = cookies or {}
+        self._cookies = cookies or {}
+        self._cookies_json = None
         self.timestamp = timestamp
         self.good = good
         self.autosign = autosign
+
+    @classmethod
+    def from_row(cls, row) -> "Account":
+        """
+        Create an Account object straight from an accounts row selected with ACCOUNT_COLUMNS.
+        The cookies column is kept undecoded until `cookies` is accessed.
+        """
+        account = cls.__new__(cls)
+        account.id = row[0]
+        account.discord_user_id = row[1]
+        account.discord_guild_id = row[2]
+        account.username = row[3]
+        account._cookies = None
+        account._cookies_json = row[4]
+        account.timestamp = row[5]
+        account.good = bool(row[6])
+        account.autosign = bool(row[7])
+        return account
+
+    @property
+    def cookies(self) -> dict:
+        if self._cookies is None:
+            self._cookies = json.loads(self._cookies_json) if self._cookies_json else {}
+            self._cookies_json = None
+        return self._cookies
+
+    @cookies.setter
+    def cookies(self, value: dict):
+        self._cookies = value or {}
+        self._cookies_json = None
+
+    @property
+    def sign_slot(self) -> int:
+        return sign_slot(self.username)
+
+    def cookies_json(self) -> str:
+        """
+        The cookies as JSON text, without decoding them if they were never read.
+        """
+        if self._cookies is None:
+            return self._cookies_json
+        return json.dumps(self._cookies)
     
     @classmethod
     def from_dict(cls, data):
@@ -59,16 +140,496 @@ class Account:
             "autosign": self.autosign
         }
 
+class AccountCache:
+    """
+    Bounded LRU of the accounts row each Discord user id resolves to (None included, so users
+    without an account are answered from memory too). Rows are immutable tuples and every hit
+    builds a fresh Account, so a caller changing its copy never changes what others read.
+
+    Invalidation bumps a generation counter; a read that started before it does not store
+    its (possibly stale) result.
+    """
+    def __init__(self, maxsize: int = 1024):
+        """
+        :param maxsize: Most Discord user ids kept; 0 disables the cache.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries: OrderedDict[int, tuple | None] = OrderedDict()
+
+    def get(self, discord_user_id: int) -> tuple[bool, Account | None]:
+        """
+        Returns:
+            (found, account); `found` is False on a miss.
+        """
+        try:
+            row = self._entries[discord_user_id]
+        except KeyError:
+            self.misses += 1
+            ACCOUNT_CACHE.inc(result="miss")
+            return False, None
+        self._entries.move_to_end(discord_user_id)
+        self.hits += 1
+        ACCOUNT_CACHE.inc(result="hit")
+        return True, Account.from_row(row) if row is not None else None
+
+    def put(self, discord_user_id: int, row: tuple | None, generation: int):
+        """
+        :param row: The accounts row selected with ACCOUNT_COLUMNS, or None when there is none.
+        """
+        if self.maxsize <= 0 or generation != self.generation:
+            return
+        self._entries[discord_user_id] = row
+        self._entries.move_to_end(discord_user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, discord_user_id: int | None = None):
+        """
+        Forget one Discord user id, or every entry when None.
+        """
+        self.generation += 1
+        if discord_user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(discord_user_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+def account_row_factory(cursor, row) -> Account:
+    """
+    sqlite3 row factory mapping accounts rows directly to Account objects.
+    """
+    return Account.from_row(row)
+
+def timed_query(method):
+    """
+    Records the latency of a DataBase method under its own name.
+    """
+    return timed(DB_QUERY_SECONDS, method=method.__name__)(method)
+
+# Applied to every connection when it is opened.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -8000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+# Statements are kept as constants so sqlite3's statement cache reuses the prepared form.
+# Upserting on username keeps an account's id stable across saves.
+SAVE_ACCOUNT_SQL = """
+    INSERT INTO accounts (discordUserId, discordGuildId, username, cookies, timestamp, good, autosign, signSlot)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (username) DO UPDATE SET
+        discordUserId = excluded.discordUserId,
+        discordGuildId = excluded.discordGuildId,
+        cookies = excluded.cookies,
+        timestamp = excluded.timestamp,
+        good = excluded.good,
+        autosign = excluded.autosign
+"""
+# Column order expected by Account.from_row.
+ACCOUNT_COLUMNS = "id, discordUserId, discordGuildId, username, cookies, timestamp, good, autosign"
+SELECT_ACCOUNT_BY_USERNAME_SQL = f"SELECT {ACCOUNT_COLUMNS} FROM accounts WHERE username = ?"
+SELECT_ACCOUNT_BY_ID_SQL = f"SELECT {ACCOUNT_COLUMNS} FROM accounts WHERE discordUserId = ?"
+SELECT_OWNER_BY_USERNAME_SQL = "SELECT discordUserId FROM accounts WHERE username = ?"
+SELECT_ALL_ACCOUNTS_SQL = f"SELECT {ACCOUNT_COLUMNS} FROM accounts"
+SELECT_AUTOSIGN_ACCOUNTS_SQL = f"SELECT {ACCOUNT_COLUMNS} FROM accounts WHERE autosign = 1"
+# Accounts already signed successfully on the given date are left out; a NULL date skips nothing.
+NOT_SIGNED_ON_SQL = """
+    NOT EXISTS (
+        SELECT 1 FROM sign_ledger
+        WHERE sign_ledger.accountId = accounts.id AND sign_ledger.signDate = ? AND sign_ledger.success = 1
+    )
+"""
+# Ordered by sign slot so a staggered run sees accounts in the order they are due.
+# Only the accounts owned by one shard; shard 0 of 1 owns every account.
+IN_SHARD_SQL = "shard_of(username, ?) = ?"
+# Accounts whose cookies the health scan found dead (good = 0) wait for a new /login.
+SELECT_AUTOSIGN_PAGE_SQL = f"""
+    SELECT {ACCOUNT_COLUMNS} FROM accounts
+    WHERE autosign = 1 AND good = 1 AND (signSlot, id) > (?, ?) AND {NOT_SIGNED_ON_SQL} AND {IN_SHARD_SQL}
+    ORDER BY signSlot, id LIMIT ?
+"""
+COUNT_AUTOSIGN_ACCOUNTS_SQL = f"SELECT COUNT(*) FROM accounts WHERE autosign = 1 AND good = 1 AND {NOT_SIGNED_ON_SQL} AND {IN_SHARD_SQL}"
+MARK_ACCOUNT_BAD_SQL = "UPDATE accounts SET good = 0 WHERE id = ?"
+# A sign that hit the guest page also marks the account as not good.
+UPDATE_LAST_SIGN_SQL = """
+    UPDATE accounts SET
+        lastSignAt = ?,
+        lastSignSuccess = ?,
+        lastSignMessage = ?,
+        good = CASE WHEN ? THEN 0 ELSE good END
+    WHERE id = ?
+"""
+# A success recorded for the day is never overwritten by a later failure.
+RECORD_SIGN_SQL = """
+    INSERT INTO sign_ledger (accountId, signDate, success, message, timestamp, attempts)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (accountId, signDate) DO UPDATE SET
+        success = excluded.success,
+        message = excluded.message,
+        timestamp = excluded.timestamp,
+        attempts = excluded.attempts
+    WHERE sign_ledger.success = 0
+"""
+# Only autosign accounts, so interactive /sign results of other accounts stay out of the run's report.
+COUNT_SIGNS_SQL = """
+    SELECT COALESCE(SUM(sign_ledger.success), 0), COUNT(*)
+    FROM sign_ledger JOIN accounts ON accounts.id = sign_ledger.accountId
+    WHERE sign_ledger.signDate = ? AND sign_ledger.timestamp >= ? AND accounts.autosign = 1
+"""
+SELECT_SIGN_RESULTS_SQL = f"""
+    SELECT {", ".join("accounts." + column for column in ACCOUNT_COLUMNS.split(", "))},
+           sign_ledger.success, sign_ledger.message, sign_ledger.attempts
+    FROM sign_ledger JOIN accounts ON accounts.id = sign_ledger.accountId
+    WHERE sign_ledger.signDate = ? AND sign_ledger.timestamp >= ? AND accounts.autosign = 1
+    ORDER BY sign_ledger.timestamp
+"""
+SAVE_SHARD_RUN_SQL = """
+    INSERT OR REPLACE INTO shard_runs (signDate, shardIndex, shardCount, status, total, success, failed, updatedAt)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SELECT_SHARD_RUNS_SQL = "SELECT shardIndex, shardCount, status, total, success, failed, updatedAt FROM shard_runs WHERE signDate = ?"
+SELECT_ACCOUNT_STATS_SQL = """
+    SELECT successDays, failedDays, streak, bestStreak, lastSuccessDate, lastFailureDate, lastFailureMessage
+    FROM account_stats WHERE accountId = ?
+"""
+SELECT_GUILD_STATS_SQL = """
+    SELECT signDate, success, failed FROM guild_daily_stats
+    WHERE discordGuildId = ? AND signDate >= ? ORDER BY signDate
+"""
+COMPACT_SIGN_LEDGER_SQL = "DELETE FROM sign_ledger WHERE signDate < ?"
+SAVE_NOTIFY_CHANNEL_SQL = """
+    INSERT OR REPLACE INTO notifychannels (discordGuildId, discordChannelId)
+    VALUES (?, ?)
+"""
+SELECT_CHANNEL_BY_ID_SQL = "SELECT * FROM notifychannels WHERE discordGuildId = ?"
+SELECT_ALL_CHANNELS_SQL = "SELECT discordGuildId, discordChannelId FROM notifychannels"
+
+# Trigger body shared by a new success day and a failure turned into a success later that day.
+ROLLUP_SUCCESS_DAY_SQL = """
+            UPDATE account_stats SET
+                streak = CASE
+                    WHEN lastSuccessDate = NEW.signDate THEN streak
+                    WHEN lastSuccessDate = date(NEW.signDate, '-1 day') THEN streak + 1
+                    ELSE 1
+                END,
+                lastSuccessDate = NEW.signDate
+            WHERE accountId = NEW.accountId AND NEW.success = 1
+              AND (lastSuccessDate IS NULL OR lastSuccessDate <= NEW.signDate);
+            UPDATE account_stats SET bestStreak = MAX(bestStreak, streak) WHERE accountId = NEW.accountId;
+"""
+
+# Schema upgrades for accounts.db, applied in order by DataBase.create_table.
+# Entry N brings the database to schema version N; append new entries, never edit shipped ones.
+ACCOUNT_MIGRATIONS = (
+    # 1: index the per-user command lookups and the nightly autosign scan
+    (
+        "CREATE INDEX IF NOT EXISTS idx_accounts_discordUserId ON accounts (discordUserId)",
+        "CREATE INDEX IF NOT EXISTS idx_accounts_autosign ON accounts (id) WHERE autosign = 1",
+    ),
+    # 2: per-day sign ledger, lets an interrupted run resume with the accounts it has not signed
+    (
+        """
+        CREATE TABLE IF NOT EXISTS sign_ledger (
+            accountId INTEGER NOT NULL,
+            signDate TEXT NOT NULL,
+            success INTEGER NOT NULL,
+            message TEXT,
+            timestamp INTEGER NOT NULL,
+            PRIMARY KEY (accountId, signDate)
+        ) WITHOUT ROWID
+        """,
+    ),
+    # 3: stable per-account slot used to stagger the nightly run over the sign window
+    (
+        "ALTER TABLE accounts ADD COLUMN signSlot INTEGER NOT NULL DEFAULT 0",
+        "UPDATE accounts SET signSlot = sign_slot(username)",
+        "CREATE INDEX IF NOT EXISTS idx_accounts_autosign_slot ON accounts (signSlot, id) WHERE autosign = 1",
+    ),
+    # 4: sharded runs, workers report their state and attempts so a coordinator can aggregate them
+    (
+        "ALTER TABLE sign_ledger ADD COLUMN attempts INTEGER NOT NULL DEFAULT 1",
+        "CREATE INDEX IF NOT EXISTS idx_sign_ledger_date ON sign_ledger (signDate, timestamp)",
+        """
+        CREATE TABLE IF NOT EXISTS shard_runs (
+            signDate TEXT NOT NULL,
+            shardIndex INTEGER NOT NULL,
+            shardCount INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            success INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            updatedAt INTEGER NOT NULL,
+            PRIMARY KEY (signDate, shardIndex)
+        ) WITHOUT ROWID
+        """,
+    ),
+    # 5: last sign outcome per account, written back in batches after each sign
+    (
+        "ALTER TABLE accounts ADD COLUMN lastSignAt INTEGER",
+        "ALTER TABLE accounts ADD COLUMN lastSignSuccess INTEGER",
+        "ALTER TABLE accounts ADD COLUMN lastSignMessage TEXT",
+    ),
+    # 6: sign history rollups, kept current by triggers on sign_ledger so old ledger rows can be compacted
+    (
+        """
+        CREATE TABLE IF NOT EXISTS guild_daily_stats (
+            discordGuildId INTEGER NOT NULL,
+            signDate TEXT NOT NULL,
+            success INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (discordGuildId, signDate)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS account_stats (
+            accountId INTEGER PRIMARY KEY,
+            successDays INTEGER NOT NULL DEFAULT 0,
+            failedDays INTEGER NOT NULL DEFAULT 0,
+            streak INTEGER NOT NULL DEFAULT 0,
+            bestStreak INTEGER NOT NULL DEFAULT 0,
+            lastSuccessDate TEXT,
+            lastFailureDate TEXT,
+            lastFailureMessage TEXT
+        )
+        """,
+        """
+        INSERT OR IGNORE INTO guild_daily_stats (discordGuildId, signDate, success, failed)
+        SELECT accounts.discordGuildId, sign_ledger.signDate, SUM(sign_ledger.success), SUM(1 - sign_ledger.success)
+        FROM sign_ledger JOIN accounts ON accounts.id = sign_ledger.accountId
+        GROUP BY accounts.discordGuildId, sign_ledger.signDate
+        """,
+        # Streaks are runs of consecutive success days: within a run, date minus row number is constant.
+        """
+        WITH runs AS (
+            SELECT accountId, signDate,
+                   julianday(signDate) - ROW_NUMBER() OVER (PARTITION BY accountId ORDER BY signDate) AS run
+            FROM sign_ledger WHERE success = 1
+        ), run_lengths AS (
+            SELECT accountId, COUNT(*) AS length, MAX(signDate) AS lastDate FROM runs GROUP BY accountId, run
+        )
+        INSERT OR IGNORE INTO account_stats
+            (accountId, successDays, failedDays, streak, bestStreak, lastSuccessDate, lastFailureDate, lastFailureMessage)
+        SELECT ledger.accountId, SUM(ledger.success), SUM(1 - ledger.success),
+               COALESCE((SELECT length FROM run_lengths WHERE run_lengths.accountId = ledger.accountId ORDER BY lastDate DESC LIMIT 1), 0),
+               COALESCE((SELECT MAX(length) FROM run_lengths WHERE run_lengths.accountId = ledger.accountId), 0),
+               MAX(CASE WHEN ledger.success = 1 THEN ledger.signDate END),
+               MAX(CASE WHEN ledger.success = 0 THEN ledger.signDate END),
+               (SELECT message FROM sign_ledger AS failure
+                WHERE failure.accountId = ledger.accountId AND failure.success = 0
+                ORDER BY failure.signDate DESC LIMIT 1)
+        FROM sign_ledger AS ledger GROUP BY ledger.accountId
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS sign_ledger_rollup_insert AFTER INSERT ON sign_ledger
+        BEGIN
+            INSERT INTO guild_daily_stats (discordGuildId, signDate, success, failed)
+            SELECT discordGuildId, NEW.signDate, NEW.success, 1 - NEW.success FROM accounts WHERE id = NEW.accountId
+            ON CONFLICT (discordGuildId, signDate) DO UPDATE SET
+                success = success + excluded.success,
+                failed = failed + excluded.failed;
+            INSERT INTO account_stats (accountId) VALUES (NEW.accountId) ON CONFLICT (accountId) DO NOTHING;
+            UPDATE account_stats SET
+                successDays = successDays + NEW.success,
+                failedDays = failedDays + 1 - NEW.success,
+                lastFailureDate = CASE WHEN NEW.success = 0 THEN NEW.signDate ELSE lastFailureDate END,
+                lastFailureMessage = CASE WHEN NEW.success = 0 THEN NEW.message ELSE lastFailureMessage END
+            WHERE accountId = NEW.accountId;
+            {ROLLUP_SUCCESS_DAY_SQL}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS sign_ledger_rollup_update AFTER UPDATE OF success, message ON sign_ledger
+        WHEN OLD.success = 0
+        BEGIN
+            UPDATE guild_daily_stats SET
+                success = success + NEW.success,
+                failed = failed - NEW.success
+            WHERE signDate = NEW.signDate
+              AND discordGuildId = (SELECT discordGuildId FROM accounts WHERE id = NEW.accountId);
+            UPDATE account_stats SET
+                successDays = successDays + NEW.success,
+                failedDays = failedDays - NEW.success,
+                -- A day that ended in success is no longer the last failure; fall back to the previous one.
+                lastFailureDate = CASE WHEN NEW.success = 1 AND lastFailureDate = NEW.signDate
+                    THEN (SELECT MAX(signDate) FROM sign_ledger WHERE accountId = NEW.accountId AND success = 0)
+                    ELSE lastFailureDate END,
+                lastFailureMessage = CASE
+                    WHEN NEW.success = 0 THEN NEW.message
+                    WHEN lastFailureDate = NEW.signDate THEN
+                        (SELECT message FROM sign_ledger WHERE accountId = NEW.accountId AND success = 0
+                         ORDER BY signDate DESC LIMIT 1)
+                    ELSE lastFailureMessage
+                END
+            WHERE accountId = NEW.accountId;
+            {ROLLUP_SUCCESS_DAY_SQL}
+        END
+        """,
+    ),
+)
+
+def sign_rows(account: Account, sign_date: str, result: dict) -> tuple[tuple, tuple]:
+    """
+    The sign_ledger row and the accounts update recording one sign result.
+    """
+    now = int(time.time())
+    success = 1 if result.get("success") else 0
+    info = result.get("info", "")
+    return (
+        (account.id, sign_date, success, info, now, result.get("attempts", 1)),
+        (now, success, info, 1 if result.get("logged_out") else 0, account.id),
+    )
+
+class SignWriteBuffer:
+    """
+    Write-behind buffer for the sign results of a run.
+
+    Results are collected in memory and written with executemany, ledger rows and account
+    updates of a chunk in one transaction, whenever `chunk_size` results are pending and
+    at least every `flush_interval` seconds. Leaving the `async with` block (or closing
+    the DataBase) flushes whatever is left. A result is lost only if the process dies
+    within `flush_interval` of recording it; the next run then signs that account again.
+    """
+    def __init__(self, db: "DataBase", chunk_size: int = 500, flush_interval: float = 2.0):
+        """
+        :param db: The DataBase the results are written to.
+        :param chunk_size: Pending results that trigger a flush; also the executemany batch size.
+        :param flush_interval: Longest time in seconds a result waits in memory.
+        """
+        self.db = db
+        self.chunk_size = max(1, int(chunk_size))
+        self.flush_interval = flush_interval
+        self._ledger_rows: list[tuple] = []
+        self._account_rows: list[tuple] = []
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "SignWriteBuffer":
+        self.db._buffers.add(self)
+        self._task = asyncio.create_task(self._loop(), name="sign-write-buffer")
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def __len__(self) -> int:
+        return len(self._ledger_rows)
+
+    async def add(self, account: Account, sign_date: str, result: dict):
+        ledger_row, account_row = sign_rows(account, sign_date, result)
+        self._ledger_rows.append(ledger_row)
+        self._account_rows.append(account_row)
+        if len(self._ledger_rows) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._ledger_rows:
+                ledger_rows, self._ledger_rows = self._ledger_rows[:self.chunk_size], self._ledger_rows[self.chunk_size:]
+                account_rows, self._account_rows = self._account_rows[:self.chunk_size], self._account_rows[self.chunk_size:]
+                try:
+                    await self.db._write_signs(ledger_rows, account_rows)
+                except Exception:
+                    # Keep the rows for the next flush.
+                    self._ledger_rows[:0] = ledger_rows
+                    self._account_rows[:0] = account_rows
+                    raise
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[DataBase] Flushing {len(self)} sign results failed, retrying later: {e}")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        finally:
+            self.db._buffers.discard(self)
+
 class DataBase:
-    def __init__(self):
-        db_folder = os.path.dirname(os.path.abspath(__file__))
-        database_folder = os.path.join(db_folder, "..", "database")
+    def __init__(self, database_folder: str | None = None, account_cache_size: int = 1024):
+        """
+        :param database_folder: Where the database files live (default: database/ in the project).
+        :param account_cache_size: Discord user ids whose account read_account_by_id keeps in memory.
+        """
+        if database_folder is None:
+            db_folder = os.path.dirname(os.path.abspath(__file__))
+            database_folder = os.path.join(db_folder, "..", "database")
         os.makedirs(database_folder, exist_ok=True)
         self.accounts_db = os.path.join(database_folder, "accounts.db")
         self.notifychannels_db = os.path.join(database_folder, "notifychannels_db.db")
+        self._accounts_conn: aiosqlite.Connection | None = None
+        self._notify_conn: aiosqlite.Connection | None = None
+        self._open_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self.account_cache = AccountCache(account_cache_size)
+        # Open SignWriteBuffers, flushed by close() if their owner did not get to it.
+        self._buffers: set[SignWriteBuffer] = set()
+
+    async def _connect(self, path: str) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(path, cached_statements=256)
+        await conn.create_function("sign_slot", 1, sign_slot, deterministic=True)
+        await conn.create_function("shard_of", 2, shard_of, deterministic=True)
+        for pragma in CONNECTION_PRAGMAS:
+            await conn.execute(pragma)
+        return conn
+
+    async def _accounts(self) -> aiosqlite.Connection:
+        """
+        The long-lived connection to accounts.db, opened on first use.
+        """
+        if self._accounts_conn is None:
+            async with self._open_lock:
+                if self._accounts_conn is None:
+                    self._accounts_conn = await self._connect(self.accounts_db)
+        return self._accounts_conn
+
+    async def _notify(self) -> aiosqlite.Connection:
+        """
+        The long-lived connection to the notify channel database, opened on first use.
+        """
+        if self._notify_conn is None:
+            async with self._open_lock:
+                if self._notify_conn is None:
+                    self._notify_conn = await self._connect(self.notifychannels_db)
+        return self._notify_conn
+
+    async def close(self):
+        for buffer in list(self._buffers):
+            await buffer.close()
+        for conn in (self._accounts_conn, self._notify_conn):
+            if conn is not None:
+                await conn.close()
+        self._accounts_conn = None
+        self._notify_conn = None
 
     async def create_table(self):
-        async with aiosqlite.connect(self.accounts_db) as db:
+        db = await self._accounts()
+        async with self._write_lock:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS accounts (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -81,8 +642,11 @@ class DataBase:
                     autosign INTEGER
                 )
             """)
+            await db.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
             await db.commit()
-        async with aiosqlite.connect(self.notifychannels_db) as db:
+            await self._migrate(db, "accounts", ACCOUNT_MIGRATIONS)
+        db = await self._notify()
+        async with self._write_lock:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS notifychannels (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -92,121 +656,330 @@ class DataBase:
             """)
             await db.commit()
 
+    async def _schema_version(self, db: aiosqlite.Connection) -> int:
+        async with db.execute("SELECT version FROM schema_version") as cursor:
+            row = await cursor.fetchone()
+        return row[0] if row else 0
+
+    async def _migrate(self, db: aiosqlite.Connection, name: str, migrations: tuple):
+        """
+        Upgrade an existing database in place to the latest schema version.
+        Each step runs in its own transaction and re-checks the version, so a
+        second process starting at the same time never applies a step twice.
+        """
+        for version, statements in enumerate(migrations, start=1):
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                current = await self._schema_version(db)
+                if current >= version:
+                    await db.rollback()
+                    continue
+                for statement in statements:
+                    await db.execute(statement)
+                await db.execute("DELETE FROM schema_version")
+                await db.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+            print(f"[DataBase] Upgraded {name} database to schema version {version}")
+
+    @timed_query
     async def save_account(self, account: Account):
-        cookies_json = json.dumps(account.cookies)
+        cookies_json = account.cookies_json()
         good_int = 1 if account.good else 0
         autosign_int = 1 if account.autosign else 0
-        async with aiosqlite.connect(self.accounts_db) as db:
-            await db.execute("""
-                INSERT OR REPLACE INTO accounts (discordUserId, discordGuildId, username, cookies, timestamp, good, autosign)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
+        db = await self._accounts()
+        self.account_cache.invalidate(account.discord_user_id)
+        async with self._write_lock:
+            # The upsert moves a username bound to another Discord user over to this one,
+            # so that user's cached account is stale too.
+            async with db.execute(SELECT_OWNER_BY_USERNAME_SQL, (account.username,)) as cursor:
+                row = await cursor.fetchone()
+            previous_owner = row[0] if row and row[0] != account.discord_user_id else None
+            if previous_owner is not None:
+                self.account_cache.invalidate(previous_owner)
+            await db.execute(SAVE_ACCOUNT_SQL, (
                 account.discord_user_id,
                 account.discord_guild_id,
                 account.username,
                 cookies_json,
                 account.timestamp,
                 good_int,
-                autosign_int
+                autosign_int,
+                account.sign_slot
             ))
             await db.commit()
+        # Again after the commit: a read that ran during the write may have seen the old row.
+        self.account_cache.invalidate(account.discord_user_id)
+        if previous_owner is not None:
+            self.account_cache.invalidate(previous_owner)
+
+    async def _fetch_accounts(self, sql: str, parameters: tuple = ()) -> list[Account]:
+        db = await self._accounts()
+        async with db.execute(sql, parameters) as cursor:
+            cursor.row_factory = account_row_factory
+            return await cursor.fetchall()
 
+    @timed_query
     async def read_account_by_username(self, username: str) -> Account:
-        async with aiosqlite.connect(self.accounts_db) as db:
-            async with db.execute("SELECT * FROM accounts WHERE username = ?", (username,)) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    account_data = {
-                        "discordUserId": row[1],
-                        "discordGuildId": row[2],
-                        "name": row[3],
-                        "cookies": json.loads(row[4]),
-                        "timestamp": row[5],
-                        "good": bool(row[6]),
-                        "autosign": bool(row[7])
-                    }
-                    return Account.from_dict(account_data)
-                return None
+        accounts = await self._fetch_accounts(SELECT_ACCOUNT_BY_USERNAME_SQL, (username,))
+        return accounts[0] if accounts else None
 
+    @timed_query
     async def read_account_by_id(self, discordUserId: int) -> Account | None:
-        async with aiosqlite.connect(self.accounts_db) as db:
-            async with db.execute("SELECT * FROM accounts WHERE discordUserId = ?", (discordUserId,)) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    account_data = {
-                        "discordUserId": row[1],
-                        "discordGuildId": row[2],
-                        "name": row[3],
-                        "cookies": json.loads(row[4]),
-                        "timestamp": row[5],
-                        "good": bool(row[6]),
-                        "autosign": bool(row[7])
-                    }
-                    return Account.from_dict(account_data)
-                return None
+        """
+        The account bound to a Discord user, served from the account cache when possible.
+        Every call returns a new Account; changes to it are only seen by others once saved
+        with save_account().
+        """
+        found, account = self.account_cache.get(discordUserId)
+        if found:
+            return account
+        generation = self.account_cache.generation
+        db = await self._accounts()
+        async with db.execute(SELECT_ACCOUNT_BY_ID_SQL, (discordUserId,)) as cursor:
+            row = await cursor.fetchone()
+        row = tuple(row) if row is not None else None
+        self.account_cache.put(discordUserId, row, generation)
+        return Account.from_row(row) if row is not None else None
 
+    @timed_query
     async def get_all_accounts(self) -> list[Account]:
         """
         Retrieves all account records asynchronously.
         Returns:
-            A list of dictionaries, each representing an account.
-        """
-        accounts: list[Account] = []
-        async with aiosqlite.connect(self.accounts_db) as db:
-            async with db.execute("SELECT * FROM accounts") as cursor:
-                async for row in cursor:
-                    account_data = {
-                        "discordUserId": row[1],
-                        "discordGuildId": row[2],
-                        "name": row[3],
-                        "cookies": json.loads(row[4]),
-                        "timestamp": row[5],
-                        "good": bool(row[6]),
-                        "autosign": bool(row[7])
-                    }
-                    accounts.append(Account.from_dict(account_data)) 
-        return accounts
+            A list of Account objects.
+        """
+        return await self._fetch_accounts(SELECT_ALL_ACCOUNTS_SQL)
     
+    @timed_query
     async def get_autosign_accounts(self) -> list[Account]:
         """
         Retrieves all account records where autosign is true.
         Returns:
             A list of Account objects with autosign enabled.
         """
-        accounts: list[Account] = []
-        async with aiosqlite.connect(self.accounts_db) as db:
-            async with db.execute("SELECT * FROM accounts WHERE autosign = 1") as cursor:
-                async for row in cursor:
-                    account_data = {
-                        "discordUserId": row[1],
-                        "discordGuildId": row[2],
-                        "name": row[3],
-                        "cookies": json.loads(row[4]),
-                        "timestamp": row[5],
-                        "good": bool(row[6]),
-                        "autosign": bool(row[7])
-                    }
-                    accounts.append(Account.from_dict(account_data)) 
-        return accounts
+        return await self._fetch_accounts(SELECT_AUTOSIGN_ACCOUNTS_SQL)
+
+    @timed_query
+    async def iter_autosign_accounts(self, page_size: int = 500, skip_signed_on: str | None = None,
+                                     shard: tuple[int, int] = (0, 1)) -> AsyncIterator[Account]:
+        """
+        Yields autosign accounts with live cookies (good) in (sign slot, id) order, fetching
+        `page_size` rows at a time.
+        Paging is keyset based (past the last seen slot and id), so every page is an index
+        range scan and only one page is held in memory.
+
+        :param skip_signed_on: ISO date; accounts with a successful ledger entry for it are skipped.
+        :param shard: (index, count); only accounts for which shard_of() is `index` are yielded.
+        """
+        shard_index, shard_count = shard
+        last_slot, last_id = -1, 0
+        while True:
+            accounts = await self._fetch_accounts(SELECT_AUTOSIGN_PAGE_SQL, (
+                last_slot, last_id, skip_signed_on, shard_count, shard_index, page_size
+            ))
+            for account in accounts:
+                yield account
+            if len(accounts) < page_size:
+                return
+            last_slot, last_id = accounts[-1].sign_slot, accounts[-1].id
+
+    @timed_query
+    async def count_autosign_accounts(self, skip_signed_on: str | None = None, shard: tuple[int, int] = (0, 1)) -> int:
+        shard_index, shard_count = shard
+        db = await self._accounts()
+        async with db.execute(COUNT_AUTOSIGN_ACCOUNTS_SQL, (skip_signed_on, shard_count, shard_index)) as cursor:
+            row = await cursor.fetchone()
+        return row[0]
+
+    @timed_query
+    async def record_sign(self, account: Account, sign_date: str, result: dict):
+        """
+        Store the outcome of signing `account` on `sign_date` (ISO date) in the sign ledger
+        and as the account's last sign, right away. Runs use sign_buffer() instead.
+        """
+        ledger_row, account_row = sign_rows(account, sign_date, result)
+        await self._write_signs([ledger_row], [account_row])
+
+    def sign_buffer(self, chunk_size: int = 500, flush_interval: float = 2.0) -> SignWriteBuffer:
+        """
+        A write-behind buffer for recording many sign results; use it with `async with`.
+        """
+        return SignWriteBuffer(self, chunk_size, flush_interval)
+
+    @timed_query
+    async def _write_signs(self, ledger_rows: list[tuple], account_rows: list[tuple]):
+        """
+        Write ledger rows (RECORD_SIGN_SQL) and account updates (UPDATE_LAST_SIGN_SQL) in one transaction.
+        """
+        db = await self._accounts()
+        async with self._write_lock:
+            try:
+                await db.executemany(RECORD_SIGN_SQL, ledger_rows)
+                await db.executemany(UPDATE_LAST_SIGN_SQL, account_rows)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+        if any(row[3] for row in account_rows):
+            self.account_cache.invalidate()
+
+    @timed_query
+    async def mark_accounts_bad(self, account_ids: list[int]):
+        """
+        Set good to False for every account in `account_ids`, in one transaction.
+        """
+        if not account_ids:
+            return
+        db = await self._accounts()
+        self.account_cache.invalidate()
+        async with self._write_lock:
+            await db.executemany(MARK_ACCOUNT_BAD_SQL, ((account_id,) for account_id in account_ids))
+            await db.commit()
+        self.account_cache.invalidate()
+
+    @timed_query
+    async def count_signs(self, sign_date: str, since: int = 0) -> tuple[int, int]:
+        """
+        Ledger outcomes of autosign accounts for `sign_date` recorded at or after the unix time `since`.
+        Returns:
+            (success count, failure count)
+        """
+        db = await self._accounts()
+        async with db.execute(COUNT_SIGNS_SQL, (sign_date, since)) as cursor:
+            success, total = await cursor.fetchone()
+        return success, total - success
+
+    @timed_query
+    async def iter_sign_results(self, sign_date: str, since: int = 0) -> AsyncIterator[tuple[Account, dict]]:
+        """
+        Yields (Account, result) for every ledger entry of an autosign account for `sign_date`
+        recorded at or after the unix time `since`, oldest first. `result` has the same keys SignModel.sign() returns,
+        plus "attempts".
+        """
+        db = await self._accounts()
+        async with db.execute(SELECT_SIGN_RESULTS_SQL, (sign_date, since)) as cursor:
+            async for row in cursor:
+                account = Account.from_row(row)
+                yield account, {"success": bool(row[8]), "info": row[9], "attempts": row[10]}
+
+    @timed_query
+    async def get_account_stats(self, account_id: int, today: str) -> dict:
+        """
+        Lifetime sign stats of one account, read from the account_stats rollup.
+
+        :param account_id: accounts.id of the account.
+        :param today: ISO date of the current sign day; the streak only counts while it
+                      reaches today or yesterday.
+        Returns:
+            dict with success_days, failed_days, streak, best_streak, last_success_date,
+            last_failure_date and last_failure_message (all zero / None before the first sign).
+        """
+        db = await self._accounts()
+        async with db.execute(SELECT_ACCOUNT_STATS_SQL, (account_id,)) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            row = (0, 0, 0, 0, None, None, None)
+        success_days, failed_days, streak, best_streak, last_success, last_failure, failure_message = row
+        yesterday = (date.fromisoformat(today) - timedelta(days=1)).isoformat()
+        return {
+            "success_days": success_days,
+            "failed_days": failed_days,
+            "streak": streak if last_success is not None and last_success >= yesterday else 0,
+            "best_streak": best_streak,
+            "last_success_date": last_success,
+            "last_failure_date": last_failure,
+            "last_failure_message": failure_message,
+        }
+
+    @timed_query
+    async def get_guild_stats(self, discordGuildId: int, since_date: str) -> list[tuple[str, int, int]]:
+        """
+        Daily sign totals of the accounts bound to a guild, read from the guild_daily_stats rollup.
+        Returns:
+            [(ISO date, success count, failure count)] from `since_date` on, oldest first;
+            days without any sign are left out.
+        """
+        db = await self._accounts()
+        async with db.execute(SELECT_GUILD_STATS_SQL, (discordGuildId, since_date)) as cursor:
+            return [tuple(row) for row in await cursor.fetchall()]
+
+    @timed_query
+    async def compact_sign_history(self, before_date: str) -> int:
+        """
+        Delete sign ledger rows older than `before_date` (ISO date). The rollups are kept,
+        so /stats is unaffected.
+        Returns:
+            Number of ledger rows deleted.
+        """
+        db = await self._accounts()
+        async with self._write_lock:
+            cursor = await db.execute(COMPACT_SIGN_LEDGER_SQL, (before_date,))
+            await db.commit()
+        if cursor.rowcount:
+            print(f"[DataBase] Compacted {cursor.rowcount} sign ledger rows before {before_date}.")
+        return cursor.rowcount
+
+    @timed_query
+    async def save_shard_run(self, sign_date: str, shard_index: int, shard_count: int, status: str,
+                             total: int = 0, success: int = 0, failed: int = 0):
+        db = await self._accounts()
+        async with self._write_lock:
+            await db.execute(SAVE_SHARD_RUN_SQL, (
+                sign_date, shard_index, shard_count, status, total, success, failed, int(time.time())
+            ))
+            await db.commit()
+
+    @timed_query
+    async def get_shard_runs(self, sign_date: str) -> dict[int, dict]:
+        """
+        State reported by each shard worker for `sign_date`, keyed by shard index.
+        """
+        db = await self._accounts()
+        async with db.execute(SELECT_SHARD_RUNS_SQL, (sign_date,)) as cursor:
+            return {
+                row[0]: {
+                    "shardCount": row[1],
+                    "status": row[2],
+                    "total": row[3],
+                    "success": row[4],
+                    "failed": row[5],
+                    "updatedAt": row[6],
+                }
+                for row in await cursor.fetchall()
+            }
     
+    @timed_query
     async def save_notify_channels(self, channel: dict):
-        async with aiosqlite.connect(self.notifychannels_db) as db:
-            await db.execute("""
-                INSERT OR REPLACE INTO notifychannels (discordGuildId, discordChannelId)
-                VALUES (?, ?)
-            """, (
+        db = await self._notify()
+        async with self._write_lock:
+            await db.execute(SAVE_NOTIFY_CHANNEL_SQL, (
                 channel["discordGuildId"],
                 channel["discordChannelId"],
             ))
             await db.commit()
     
+    @timed_query
     async def read_channel_by_id(self, discordGuildId: int) -> dict:
-        async with aiosqlite.connect(self.accounts_db) as db:
-            async with db.execute("SELECT * FROM notifychannels WHERE discordGuildId = ?", (discordGuildId,)) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    return {
-                        "discordGuildId": row[1],
-                        "discordChannelId": row[2],
-                    }
-                return {}
\ No newline at end of file
+        db = await self._notify()
+        async with db.execute(SELECT_CHANNEL_BY_ID_SQL, (discordGuildId,)) as cursor:
+            row = await cursor.fetchone()
+            if row:
+                return {
+                    "discordGuildId": row[1],
+                    "discordChannelId": row[2],
+                }
+            return {}
+
+    @timed_query
+    async def get_notify_channels(self) -> dict[int, int]:
+        """
+        Every configured notification channel.
+        Returns:
+            A dictionary mapping discordGuildId to discordChannelId.
+        """
+        db = await self._notify()
+        async with db.execute(SELECT_ALL_CHANNELS_SQL) as cursor:
+            return {row[0]: row[1] for row in await cursor.fetchall()}
@@ -0,0 +1,221 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator
+from urllib.parse import urlparse
+
+import aiohttp
+
+from model.MetricsModel import RATE_LIMIT_WAIT_SECONDS
+from model.TraceModel import span
+
+# Priority lanes of the rate limiter, highest first: someone waiting on Discord, then bulk work.
+INTERACTIVE = 0
+BULK = 1
+LANE_NAMES = ("interactive", "bulk")
+
+# Lane of the requests made by the current task; tasks created inside inherit it.
+_lane: ContextVar[int] = ContextVar("request_lane", default=INTERACTIVE)
+
+@contextmanager
+def request_lane(lane: int) -> Iterator[None]:
+    """
+    Send the limited requests made inside the with block through `lane`.
+    """
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket plus an AIMD concurrency window for one upstream host.
+
+    Every request takes a token (refilled at `rate` per second) and a slot in the
+    concurrency window. Fast successful responses grow the rate and the window
+    additively; timeouts, connection errors, 429 and 5xx responses halve both.
+
+    Waiters are served by lane: while a request of a higher priority lane is waiting,
+    requests of lower lanes do not take a token or a slot.
+    """
+    def __init__(self, rate: float = 2.0, min_rate: float = 0.2, max_rate: float = 20.0,
+                 max_concurrency: int = 10, target_latency: float = 3.0):
+        """
+        :param rate: Initial requests per second.
+        :param min_rate: The rate never drops below this.
+        :param max_rate: The rate never grows above this.
+        :param max_concurrency: Upper bound of the concurrency window.
+        :param target_latency: Responses slower than this (seconds) stop the rate from growing.
+        """
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.concurrency = max(1.0, max_concurrency / 2)
+        self.tokens = 1.0
+        self.in_flight = 0
+        self.latency = 0.0
+        self.successes = 0
+        self.congestions = 0
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._waiting = [0] * len(LANE_NAMES)
+        self._cond = asyncio.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def acquire(self, lane: int = INTERACTIVE):
+        """
+        Wait for a token and a slot in the concurrency window.
+
+        :param lane: INTERACTIVE or BULK; a lane only proceeds when no higher lane is waiting.
+        """
+        async with self._cond:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    self._refill()
+                    yielding = any(self._waiting[:lane])
+                    if not yielding and self.in_flight < int(self.concurrency) and self.tokens >= 1:
+                        self.tokens -= 1
+                        self.in_flight += 1
+                        return
+                    if yielding or self.in_flight >= int(self.concurrency):
+                        await self._cond.wait()
+                    else:
+                        try:
+                            await asyncio.wait_for(self._cond.wait(), (1 - self.tokens) / self.rate)
+                        except asyncio.TimeoutError:
+                            pass
+            finally:
+                self._waiting[lane] -= 1
+                # The last waiter of a lane leaving (served or cancelled) unblocks the lanes below it.
+                if not self._waiting[lane] and any(self._waiting[lane + 1:]):
+                    self._cond.notify_all()
+
+    async def release(self, ok: bool, latency: float):
+        """
+        Give back a slot and adapt to the outcome of the request that held it.
+
+        :param ok: False for timeouts, connection errors, 429 and 5xx responses.
+        :param latency: Seconds until the response headers arrived.
+        """
+        async with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if ok:
+                self.successes += 1
+                self.latency = latency if not self.latency else 0.8 * self.latency + 0.2 * latency
+                if latency <= self.target_latency:
+                    self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+                    self.rate = min(self.max_rate, self.rate + 0.1)
+            else:
+                self.congestions += 1
+                # Requests already in flight fail together; back off once per latency window.
+                if now - self._last_decrease > max(self.latency, 1.0):
+                    self.concurrency = max(1.0, self.concurrency / 2)
+                    self.rate = max(self.min_rate, self.rate / 2)
+                    self._last_decrease = now
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        """
+        Current limiter state, for logs and reporting.
+        """
+        return {
+            "rate": round(self.rate, 2),
+            "concurrency": int(self.concurrency),
+            "in_flight": self.in_flight,
+            "latency": round(self.latency, 3),
+            "successes": self.successes,
+            "congestions": self.congestions,
+            "waiting": dict(zip(LANE_NAMES, self._waiting)),
+        }
+
+class HttpClient:
+    """
+    Long-lived HTTP client shared by the sign and login models.
+    The session never stores cookies; every request carries the cookies of its own account.
+    """
+    def __init__(self, limit: int = 100, limit_per_host: int = 10, keepalive_timeout: float = 30, dns_cache_ttl: int = 300,
+                 limiter: AdaptiveRateLimiter | None = None, limited_host: str | None = None):
+        """
+        :param limit: Total number of pooled connections.
+        :param limit_per_host: Connections allowed to a single host (bbs.yamibo.com).
+        :param keepalive_timeout: Seconds an idle connection is kept for reuse.
+        :param dns_cache_ttl: Seconds a resolved address is cached.
+        :param limiter: Rate limiter applied by request() to `limited_host`.
+        :param limited_host: Host name whose requests go through `limiter`.
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.limiter = limiter
+        self.limited_host = limited_host
+        self._session: aiohttp.ClientSession | None = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        The shared session, created on first use inside the running event loop.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl,
+                use_dns_cache=True,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                cookie_jar=aiohttp.DummyCookieJar(),
+                timeout=aiohttp.ClientTimeout(total=30),
+            )
+        return self._session
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        Same as session.request(), but requests to the limited host wait for the rate limiter
+        in the lane set with request_lane() (INTERACTIVE by default) and report their outcome back to it.
+        """
+        if self.limiter is None or urlparse(url).hostname != self.limited_host:
+            async with self.session.request(method, url, **kwargs) as resp:
+                yield resp
+            return
+
+        lane = _lane.get()
+        with RATE_LIMIT_WAIT_SECONDS.time(lane=LANE_NAMES[lane]), span("rate_limit_wait", lane=LANE_NAMES[lane]):
+            await self.limiter.acquire(lane)
+        start = time.monotonic()
+        latency = None
+        ok = False
+        try:
+            async with self.session.request(method, url, **kwargs) as resp:
+                latency = time.monotonic() - start
+                ok = resp.status != 429 and resp.status < 500
+                yield resp
+        except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
+            ok = False
+            raise
+        finally:
+            await self.limiter.release(ok, latency if latency is not None else time.monotonic() - start)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+def response_cookies(resp: aiohttp.ClientResponse) -> dict[str, str]:
+    """
+    Cookies set by a response, as a plain name -> value dict.
+    """
+    return {key: morsel.value for key, morsel in resp.cookies.items()}
@@ -1,12 +1,183 @@
 import asyncio
 import aiohttp
+import functools
+import hashlib
 import time
 import re
+from typing import Awaitable, Callable, Hashable
 
 import bot
 from model.DataModel import Account
+from model.HttpModel import response_cookies
+from model.MetricsModel import LOGIN_ATTEMPTS, LOGIN_PAGE_CACHE, LOGIN_SECONDS, LOGIN_SHARED
+from model.ScanModel import ScanResult, scan_response
 import var
 
+# Markers that only appear on pages served to a visitor who is not logged in.
+LOGGED_OUT_MARKERS = (
+    "placeholder=\"用户名/Email/UID\"",
+    "您需要先登录才能继续本操作",
+)
+
+LOGGED_OUT_NEEDLE = tuple(marker.encode("utf-8") for marker in LOGGED_OUT_MARKERS)
+
+# The login success message, as the AJAX login (JavaScript) and the login page (HTML) render it.
+JS_SUCCESS_PATTERN = re.compile(r"\$\('succeedlocation'\)\.innerHTML\s*=\s*'([^<]+)<font[^>]+>([^<]+)</font>\s*([^，']+)")
+HTML_SUCCESS_PATTERN = re.compile(r'<div id="messagetext" class="alert_right">\s*<p>([^<]+)<font[^>]+>([^<]+)</font>\s*([^<,]+)')
+# Login result when Yamibo answered with a page that is neither the guest page nor a welcome message.
+UNEXPECTED_PAGE_MESSAGE = "Login failed: Unexpected response from Yamibo, please try again later."
+# Byte level locators of the same two messages for the streaming scanner, which hands the
+# located part to parse_success_xml_to_text.
+LOGIN_PAGE_PATTERNS = {
+    "logged_out": LOGGED_OUT_NEEDLE,
+    "welcome_js": re.compile(rb"\$\('succeedlocation'\)\.innerHTML\s*=\s*'[^']*'"),
+    "welcome_html": re.compile(rb'<div id="messagetext" class="alert_right">\s*<p>[^<]+<font[^>]+>[^<]+</font>[^<]*(?=<)'),
+}
+
+def welcome_text(page: ScanResult) -> str:
+    """
+    The located login success message of a scanned page, or the whole scanned text without one.
+    """
+    return page.group("welcome_js") or page.group("welcome_html") or page.text()
+
+def is_logged_out_page(html: str) -> bool:
+    """
+    Whether a Yamibo page was rendered for a guest, i.e. the cookies sent with it are invalid.
+    """
+    return any(marker in html for marker in LOGGED_OUT_MARKERS)
+
+async def check_cookies(cookies: dict) -> bool | None:
+    """
+    Whether `cookies` still belong to a logged-in session, judged from the same page
+    the cookie login reads.
+    Returns:
+        True when logged in, False when Yamibo served the guest page, None when the check
+        itself failed (timeout, connection error, 429/5xx) and nothing can be said.
+    """
+    try:
+        async with bot.http_client.request("GET", var.LOGIN_URL, cookies=cookies, timeout=15) as resp:
+            if resp.status == 429 or resp.status >= 500:
+                return None
+            page = await scan_response(resp, LOGIN_PAGE_PATTERNS, "login_page")
+    except (asyncio.TimeoutError, aiohttp.ClientError):
+        return None
+    return "logged_out" not in page
+
+class SingleFlight:
+    """
+    Lets concurrent calls for the same key share one in-flight attempt.
+
+    A call joins the attempt in flight under any of its keys when both carry the same
+    fingerprint (e.g. a double-submitted modal). With a different fingerprint it waits
+    for that attempt to finish and then runs its own, so attempts for one key never overlap.
+    """
+    def __init__(self):
+        self._calls: dict[Hashable, tuple[Hashable, asyncio.Future]] = {}
+
+    async def do(self, keys: tuple[Hashable, ...], fingerprint: Hashable, function: Callable[[], Awaitable]):
+        """
+        :param keys: Every key the attempt is known by; a call in flight under any of them is found.
+        :param fingerprint: Calls only share a result when their fingerprints are equal.
+        :param function: Runs the attempt when there is none to join.
+        Returns:
+            The result of `function`, or of the attempt that was joined.
+        """
+        while True:
+            call = next((self._calls[key] for key in keys if key in self._calls), None)
+            if call is None:
+                break
+            call_fingerprint, future = call
+            if call_fingerprint == fingerprint:
+                LOGIN_SHARED.inc()
+                return await asyncio.shield(future)
+            await asyncio.wait([future])
+
+        future = asyncio.get_running_loop().create_future()
+        for key in keys:
+            self._calls[key] = (fingerprint, future)
+        try:
+            result = await function()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Retrieved here so a call nobody joined does not log "never retrieved".
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            for key in keys:
+                if self._calls.get(key, (None, None))[1] is future:
+                    del self._calls[key]
+
+class LoginPageCache:
+    """
+    Guest session cookies (the saltkey) handed out with the login page, kept for `ttl`
+    seconds so a burst of password logins makes one GET instead of one each.
+    """
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self._cookies: dict[str, str] | None = None
+        self._expires = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> dict[str, str] | None:
+        if self._cookies is not None and time.monotonic() < self._expires:
+            return dict(self._cookies)
+        return None
+
+    async def cookies(self) -> dict[str, str]:
+        cookies = self._fresh()
+        if cookies is not None:
+            LOGIN_PAGE_CACHE.inc(result="hit")
+            return cookies
+        async with self._lock:
+            cookies = self._fresh()
+            if cookies is not None:
+                LOGIN_PAGE_CACHE.inc(result="hit")
+                return cookies
+            LOGIN_PAGE_CACHE.inc(result="miss")
+            async with bot.http_client.request("GET", var.LOGIN_URL, timeout=15) as resp:
+                await resp.read()
+                cookies = response_cookies(resp)
+                if resp.status < 400 and cookies:
+                    self._cookies = dict(cookies)
+                    self._expires = time.monotonic() + self.ttl
+            return cookies
+
+    def invalidate(self):
+        self._cookies = None
+
+LOGIN_FLIGHTS = SingleFlight()
+LOGIN_PAGE = LoginPageCache()
+
+def credentials_fingerprint(*parts: str) -> str:
+    """
+    Identifies a set of credentials without keeping them around in plain text.
+    """
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+def observed_login(method: str):
+    """
+    Decorator recording the duration and outcome of a login() in the metrics.
+    """
+    def decorate(login):
+        @functools.wraps(login)
+        async def wrapper(self) -> tuple[str, Account]:
+            try:
+                with LOGIN_SECONDS.time(method=method):
+                    message, account = await login(self)
+            except Exception:
+                LOGIN_ATTEMPTS.inc(method=method, outcome="error")
+                raise
+            LOGIN_ATTEMPTS.inc(method=method, outcome="success" if account.good else "failed")
+            return message, account
+        return wrapper
+    return decorate
+
 class YamiboLogin_Cookie:
     def __init__(self, discordUserId: int, discordGuildId: int, username: str, auth: str, saltkey: str):
         """
@@ -22,7 +193,19 @@ class YamiboLogin_Cookie:
         self.auth = auth
         self.saltkey = saltkey
     
+    @observed_login("cookie")
     async def login(self) -> tuple[str, Account]:
+        """
+        Log in with the cookies; a concurrent login of the same Discord user with the same
+        cookies shares this attempt.
+        """
+        return await LOGIN_FLIGHTS.do(
+            (("user", self.discordUserId),),
+            credentials_fingerprint("cookie", self.auth, self.saltkey),
+            self._login,
+        )
+
+    async def _login(self) -> tuple[str, Account]:
         account = Account(
             discord_user_id=self.discordUserId,
             discord_guild_id=self.discordGuildId,
@@ -38,22 +221,27 @@ class YamiboLogin_Cookie:
         message = "Login failed: Unknown Reason"
         
         try:
-            async with aiohttp.ClientSession(cookies=account.cookies) as session:
-                async with session.get(var.LOGIN_URL, timeout=15) as resp:
-                    check_page_html = await resp.text()
-                #Page not login in
-                if "placeholder=\"用户名/Email/UID\"" in check_page_html:
-                    message = f"Login failed : Cookie is not correct or already expired."
-                    
-                    return message, account
-                else:
-                    formated_message, username = parse_success_xml_to_text(check_page_html)
+            http = bot.http_client
+            async with http.request("GET", var.LOGIN_URL, cookies=account.cookies, timeout=15) as resp:
+                if resp.status == 429 or resp.status >= 500:
+                    return unavailable_message(resp.status), account
+                check_page = await scan_response(resp, LOGIN_PAGE_PATTERNS, "login_page")
+            #Page not login in
+            if "logged_out" in check_page:
+                message = f"Login failed : Cookie is not correct or already expired."
+                
+                return message, account
+            else:
+                parsed = parse_success_xml_to_text(welcome_text(check_page))
+                if parsed is None:
+                    return UNEXPECTED_PAGE_MESSAGE, account
+                formated_message, username = parsed
 
-                    account.good = True
-                    account.username = username
-                    
-                    await bot.db.save_account(account)
-                    return formated_message, account
+                account.good = True
+                account.username = username
+                
+                await bot.db.save_account(account)
+                return formated_message, account
         except TimeoutError:
             message = "Login failed: Timeout."
         
@@ -77,9 +265,12 @@ class YamiboLogin_Password:
         self.safety_question = safety_question
         self.safety_answer = safety_answer
 
+    @observed_login("password")
     async def login(self) -> tuple[str, Account]:
         """
         Attempt to log in to Yamibo using username and password.
+        Concurrent logins of the same Discord user or Yamibo username with the same
+        credentials share one attempt; with other credentials they run one after another.
         Returns:
             tuple: (message, Account) where:
                 - message: Success or error message
@@ -91,6 +282,13 @@ class YamiboLogin_Password:
                     - timestamp: Current epoch time
                     - good: Boolean indicating if login was successful
         """
+        return await LOGIN_FLIGHTS.do(
+            (("user", self.discordUserId), ("username", self.username.lower())),
+            credentials_fingerprint("password", self.username, self.password, self.safety_question, self.safety_answer or ""),
+            self._login,
+        )
+
+    async def _login(self) -> tuple[str, Account]:
         account = Account(
             discord_user_id=self.discordUserId,
             discord_guild_id=self.discordGuildId,
@@ -103,63 +301,75 @@ class YamiboLogin_Password:
         message = "Login failed: Unknown Reason"
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(var.LOGIN_URL, timeout=15) as resp:
-                    login_page_html = await resp.text()
-                    
-                form_data = {
-                    "username": self.username,
-                    "password": self.password,
-                    "questionid": self.safety_question,
-                }
-                if self.safety_question != "0":
-                    form_data["answer"] = self.safety_answer
-
-                async with session.post(var.LOGIN_POST_URL, data=form_data, timeout=15) as resp:
-                    text_response = await resp.text()
-
-                cookies_from_jar = {}
-                for cookie in session.cookie_jar:
-                    """
-                    Yamibo only need two cookies to login :
-                    EeqY_2132_auth : len(111) A-Za-z%
-                    EeqY_2132_saltkey : len(25) A-Za-z
-                    """
-                    if "auth" in cookie.key or "saltkey" in cookie.key:
-                        cookies_from_jar[cookie.key] = cookie.value
+            http = bot.http_client
+            session_cookies = await LOGIN_PAGE.cookies()
+
+            form_data = {
+                "username": self.username,
+                "password": self.password,
+                "questionid": self.safety_question,
+            }
+            if self.safety_question != "0":
+                form_data["answer"] = self.safety_answer
+
+            async with http.request("POST", var.LOGIN_POST_URL, data=form_data, cookies=session_cookies, timeout=15) as resp:
+                if resp.status == 429 or resp.status >= 500:
+                    return unavailable_message(resp.status), account
+                text_response = await resp.text()
+                session_cookies.update(response_cookies(resp))
+
+            cookies_from_jar = {}
+            for key, value in session_cookies.items():
+                """
+                Yamibo only need two cookies to login :
+                EeqY_2132_auth : len(111) A-Za-z%
+                EeqY_2132_saltkey : len(25) A-Za-z
+                """
+                if "auth" in key or "saltkey" in key:
+                    cookies_from_jar[key] = value
+            
+            account.cookies = cookies_from_jar
+            
+            if len(cookies_from_jar) != 2:
+                # The cached guest session may be what was rejected; the next attempt fetches a new one.
+                LOGIN_PAGE.invalidate()
+                if self.safety_answer:
+                    text_response = text_response.replace(self.safety_answer, '*' * len(self.safety_answer))
+                text_response = text_response.replace(self.password, '*' * len(self.password))
                 
-                account.cookies = cookies_from_jar
+                message = f"Login failed: {text_response}"
+                return message, account
+            else:
+                parsed = parse_success_xml_to_text(text_response)
+                if parsed is None:
+                    return UNEXPECTED_PAGE_MESSAGE, account
+                account.good = True
+                formated_message, username = parsed
                 
-                if len(cookies_from_jar) != 2:
-                    if self.safety_answer:
-                        text_response = text_response.replace(self.safety_answer, '*' * len(self.safety_answer))
-                    text_response = text_response.replace(self.password, '*' * len(self.password))
-                    
-                    message = f"Login failed: {text_response}"
-                    return message, account
-                else:
-                    account.good = True
-                    formated_message, username = parse_success_xml_to_text(text_response)
-                    
-                    await bot.db.save_account(account)
-                    return formated_message, account
+                await bot.db.save_account(account)
+                return formated_message, account
                     
         except asyncio.TimeoutError:
             message = "Login failed: Timeout."
 
         return message, account
     
-def parse_success_xml_to_text(text_response: str) -> tuple[str, str]:
+def unavailable_message(status: int) -> str:
+    """
+    Login result for a 429/5xx answer, which says nothing about the credentials.
+    """
+    return f"Login failed: Yamibo is unavailable (HTTP {status}), please try again later."
+
+def parse_success_xml_to_text(text_response: str) -> tuple[str, str] | None:
         """
         Parse the login success message from the response text.
         This function handles two possible formats:
         1. JavaScript format: $('succeedlocation').innerHTML = '...';
         2. HTML format: <div id="messagetext" class="alert_right"><p>欢迎您回来，...</p>
         
-        Returns a formatted [success message, username].
+        Returns a formatted [success message, username], or None when the page holds neither.
         """
-        js_pattern = r"\$\('succeedlocation'\)\.innerHTML\s*=\s*'([^<]+)<font[^>]+>([^<]+)</font>\s*([^，']+)"
-        js_match = re.search(js_pattern, text_response)
+        js_match = JS_SUCCESS_PATTERN.search(text_response)
         
         if js_match:
             part1 = js_match.group(1)  # Expected: "欢迎您回来，"
@@ -168,8 +378,7 @@ def parse_success_xml_to_text(text_response: str) -> tuple[str, str]:
             result = part1.strip() + " " + part2.strip() + " " + part3.strip()
             return result, part3.strip()  # Output: 欢迎您回来， 百合花蕾 thenano
         
-        html_pattern = r'<div id="messagetext" class="alert_right">\s*<p>([^<]+)<font[^>]+>([^<]+)</font>\s*([^<,]+)'
-        html_match = re.search(html_pattern, text_response)
+        html_match = HTML_SUCCESS_PATTERN.search(text_response)
         
         if html_match:
             part1 = html_match.group(1)  # Expected: "欢迎您回来，"
@@ -178,4 +387,4 @@ def parse_success_xml_to_text(text_response: str) -> tuple[str, str]:
             result = part1.strip() + " " + part2.strip() + " " + part3.strip()
             return result, part3.strip()  # Output: 欢迎您回来， 百合花蕾 thenano
             
-        return text_response
\ No newline at end of file
+        return None
\ No newline at end of file
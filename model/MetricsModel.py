@@ -0,0 +1,245 @@
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from aiohttp import web
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RUN_BUCKETS = (10.0, 30.0, 60.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0, 7200.0, 14400.0)
+
+REGISTRY: list["Metric"] = []
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Metric:
+    """
+    One metric family in the Prometheus text format, with a fixed set of label names.
+    Updates are plain attribute writes on the event loop thread, so no lock is taken.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        """
+        :param name: Metric name, e.g. "yamibo_sign_results_total".
+        :param documentation: One line shown as # HELP.
+        :param labels: Label names every update has to supply as keyword arguments.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: dict[tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _label_text(self, key: tuple[str, ...], extra: tuple[tuple[str, str], ...] = ()) -> str:
+        pairs = tuple(zip(self.labels, key)) + extra
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{self._label_text(key)} {value}"
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]):
+        """
+        Read the (unlabelled) value from `function` at scrape time instead.
+        """
+        self._function = function
+
+    def samples(self) -> Iterator[str]:
+        if self._function is not None:
+            yield f"{self.name} {self._function()}"
+            return
+        yield from super().samples()
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        :param buckets: Upper bounds of the buckets in seconds; +Inf is added implicitly.
+        """
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # Per bucket counts (not cumulative), then sum and count.
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[0][index] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the seconds spent inside the with block, awaits included.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{self._label_text(key, (('le', repr(bound)),))} {cumulative}"
+            yield f"{self.name}_bucket{self._label_text(key, (('le', '+Inf'),))} {count}"
+            yield f"{self.name}_sum{self._label_text(key)} {total}"
+            yield f"{self.name}_count{self._label_text(key)} {count}"
+
+def timed(histogram: Histogram, **labels):
+    """
+    Decorator observing how long each call of a coroutine function takes.
+    For an async generator function, the time spent producing items (not the time the
+    consumer holds them) is summed and observed once when the generator finishes.
+    """
+    def decorate(function):
+        if inspect.isasyncgenfunction(function):
+            @functools.wraps(function)
+            async def generator_wrapper(*args, **kwargs):
+                elapsed = 0.0
+                generator = function(*args, **kwargs)
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            item = await generator.__anext__()
+                        except StopAsyncIteration:
+                            return
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        yield item
+                finally:
+                    await generator.aclose()
+                    histogram.observe(elapsed, **labels)
+            return generator_wrapper
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def render_metrics() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """
+    Serve every registered metric at http://host:port/metrics.
+    Returns:
+        The runner; stop the server with `await runner.cleanup()`.
+    """
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"[Metrics] Serving metrics at http://{host}:{port}/metrics")
+    return runner
+
+"""
+METRICS
+"""
+
+SIGN_PHASE_SECONDS = Histogram(
+    "yamibo_sign_phase_seconds", "Time spent in each phase of SignModel.sign().", ("phase",)
+)
+SIGN_RESULTS = Counter(
+    "yamibo_sign_results_total", "Sign attempts by outcome (success, retryable, failed).", ("outcome",)
+)
+LOGIN_SECONDS = Histogram(
+    "yamibo_login_seconds", "Duration of login attempts.", ("method",)
+)
+LOGIN_ATTEMPTS = Counter(
+    "yamibo_login_attempts_total", "Login attempts by method and outcome (success, failed, error).", ("method", "outcome")
+)
+LOGIN_SHARED = Counter(
+    "yamibo_login_shared_total", "Logins that joined an identical attempt already in flight."
+)
+LOGIN_PAGE_CACHE = Counter(
+    "yamibo_login_page_cache_total", "Login page (guest session) cache lookups by result (hit, miss).", ("result",)
+)
+ACCOUNT_CACHE = Counter(
+    "yamibo_account_cache_total", "read_account_by_id cache lookups by result (hit, miss).", ("result",)
+)
+HEALTH_CHECKS = Counter(
+    "yamibo_cookie_health_checks_total", "Pre-run cookie checks by outcome (alive, dead, unknown).", ("outcome",)
+)
+DB_QUERY_SECONDS = Histogram(
+    "yamibo_db_query_seconds", "Latency of DataBase methods, lock waits included.", ("method",)
+)
+RUN_SECONDS = Histogram(
+    "yamibo_run_duration_seconds", "Duration of autosign runs.", ("kind",), buckets=RUN_BUCKETS
+)
+RUN_LAST_SUCCESS = Gauge(
+    "yamibo_run_last_completed_timestamp_seconds", "Unix time the last autosign run completed.", ("kind",)
+)
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "yamibo_rate_limit_wait_seconds", "Time requests waited for the rate limiter, by lane (interactive, bulk).", ("lane",)
+)
+SIGNS_IN_FLIGHT = Gauge(
+    "yamibo_signs_in_flight", "Signs running through the SignScheduler, by lane.", ("lane",)
+)
+SCAN_RESULTS = Counter(
+    "yamibo_page_scans_total", "Streaming page scans by page and why they stopped (match, eof, limit).", ("page", "outcome")
+)
+SCAN_BYTES = Counter(
+    "yamibo_page_scan_bytes_total", "Bytes of page bodies read by the streaming scanner.", ("page",)
+)
+SIGN_QUEUE_DEPTH = Gauge(
+    "yamibo_sign_queue_depth", "Accounts ready to be signed and waiting for a worker."
+)
+SIGN_RETRIES_PENDING = Gauge(
+    "yamibo_sign_retries_pending", "Accounts waiting out a retry backoff."
+)
+SERVICE_RESTARTS = Counter(
+    "yamibo_service_restarts_total", "Background services restarted by their supervisor after a crash.", ("service",)
+)
+DISCORD_EDIT_SECONDS = Histogram(
+    "yamibo_discord_edit_seconds", "Latency of Discord message edits.", ("kind",)
+)
+DISCORD_EDIT_ERRORS = Counter(
+    "yamibo_discord_edit_errors_total", "Failed Discord message edits by HTTP status, \"error\" when no response came back.", ("kind", "status")
+)
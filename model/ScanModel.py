@@ -0,0 +1,152 @@
+import re
+from typing import AsyncIterable, Union
+
+import aiohttp
+
+from model.MetricsModel import SCAN_BYTES, SCAN_RESULTS
+
+# Most of a page the scanner reads before giving up on the patterns it is still missing.
+SCAN_LIMIT = 512 * 1024
+# After an early exit, up to this much of the rest of the body is read and discarded so the
+# keep-alive connection goes back to the pool; aiohttp closes it when the body is left unread.
+DRAIN_LIMIT = 64 * 1024
+# Longest match a pattern may have. Each new chunk is searched together with this many bytes
+# before it, so a match split across two chunks is still found.
+MATCH_WINDOW = 2 * 1024
+CHUNK_SIZE = 16 * 1024
+
+# A compiled bytes pattern, or literal markers of which any one counts as a match. Literals are
+# found with bytes.find, much faster than a regex alternation, which gets no prefix scan.
+Needle = Union[re.Pattern[bytes], tuple[bytes, ...]]
+
+class ScanResult:
+    """
+    What a scan found: the groups of each pattern that matched, and the bytes read.
+    """
+    def __init__(self, body: bytes, matches: dict[str, tuple[bytes, ...]], charset: str, outcome: str):
+        """
+        :param body: Every byte read before the scan stopped.
+        :param matches: Pattern name -> (group 0, group 1, ...) of its first match.
+        :param charset: Used to decode the matches and the body.
+        :param outcome: Why the scan stopped: "match", "eof" or "limit".
+        """
+        self.body = body
+        self.matches = matches
+        self.charset = charset
+        self.outcome = outcome
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.matches
+
+    def group(self, name: str, index: int = 0) -> str | None:
+        """
+        Group `index` of the match of pattern `name`, decoded; None when it did not match.
+        """
+        groups = self.matches.get(name)
+        if groups is None or groups[index] is None:
+            return None
+        return groups[index].decode(self.charset, errors="replace")
+
+    def text(self) -> str:
+        return self.body.decode(self.charset, errors="replace")
+
+class HtmlScanner:
+    """
+    Searches a page for precompiled byte patterns while it is being read, so the caller can
+    stop reading once the patterns it needs have matched.
+
+    Patterns run on the raw bytes. Keep them to ASCII delimiters (a UTF-8 multi-byte
+    character never contains an ASCII byte) and decode the matched part afterwards.
+    A pattern must end on a delimiter it requires, so it cannot match a chunk cut short,
+    and should start with a literal, which lets re skip ahead to candidate positions.
+    """
+    def __init__(self, patterns: dict[str, Needle], stop_on: tuple[str, ...] | None = None,
+                 limit: int = SCAN_LIMIT, window: int = MATCH_WINDOW):
+        """
+        :param patterns: Name -> compiled bytes pattern or literal markers; only the first match of each is kept.
+        :param stop_on: Names whose match ends the scan (default: any pattern).
+        :param limit: Bytes after which the scan ends regardless.
+        :param window: Longest match the patterns can produce.
+        """
+        self.patterns = patterns
+        self.stop_on = tuple(patterns) if stop_on is None else stop_on
+        self.limit = limit
+        self.window = window
+        self.matches: dict[str, tuple[bytes, ...]] = {}
+        self._buffer = bytearray()
+
+    @property
+    def done(self) -> bool:
+        return any(name in self.matches for name in self.stop_on) or len(self._buffer) >= self.limit
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Scan the next chunk of the page.
+        Returns:
+            True once the scan is done and no further chunks are needed.
+        """
+        start = max(0, len(self._buffer) - self.window)
+        self._buffer += chunk[:self.limit - len(self._buffer)]
+        for name, pattern in self.patterns.items():
+            if name in self.matches:
+                continue
+            if isinstance(pattern, tuple):
+                for marker in pattern:
+                    if self._buffer.find(marker, start) != -1:
+                        self.matches[name] = (marker,)
+                        break
+                continue
+            match = pattern.search(self._buffer, start)
+            if match:
+                self.matches[name] = (bytes(match.group(0)),) + tuple(
+                    bytes(group) if group is not None else None for group in match.groups()
+                )
+        return self.done
+
+    def result(self, charset: str = "utf-8") -> ScanResult:
+        if any(name in self.matches for name in self.stop_on):
+            outcome = "match"
+        else:
+            outcome = "limit" if len(self._buffer) >= self.limit else "eof"
+        return ScanResult(bytes(self._buffer), dict(self.matches), charset, outcome)
+
+async def scan_chunks(chunks: AsyncIterable[bytes], scanner: HtmlScanner, charset: str = "utf-8") -> ScanResult:
+    """
+    Feed `chunks` to `scanner` until it is done or they run out.
+    """
+    async for chunk in chunks:
+        if scanner.feed(chunk):
+            break
+    return scanner.result(charset)
+
+async def _drain(resp: aiohttp.ClientResponse, limit: int) -> bool:
+    """
+    Read and discard what is left of the body, up to `limit` bytes.
+    Returns:
+        True when the body was read to the end.
+    """
+    drained = 0
+    while drained <= limit:
+        chunk = await resp.content.readany()
+        if not chunk:
+            return True
+        drained += len(chunk)
+    return False
+
+async def scan_response(resp: aiohttp.ClientResponse, patterns: dict[str, Needle], page: str,
+                        stop_on: tuple[str, ...] | None = None, limit: int = SCAN_LIMIT, drain: int = DRAIN_LIMIT) -> ScanResult:
+    """
+    Scan the body of `resp` in chunks for `patterns`, without reading or decoding it whole.
+
+    :param page: Name of the page in the metrics, e.g. "sign_page".
+    :param stop_on: Names whose match ends the scan (default: any pattern).
+    :param limit: Bytes after which the scan ends regardless.
+    :param drain: After an early match, read at most this much more to keep the connection reusable.
+    """
+    scanner = HtmlScanner(patterns, stop_on, limit)
+    result = await scan_chunks(resp.content.iter_chunked(CHUNK_SIZE), scanner, resp.charset or "utf-8")
+    SCAN_RESULTS.inc(page=page, outcome=result.outcome)
+    SCAN_BYTES.inc(len(result.body), page=page)
+    if result.outcome == "match" and not resp.content.at_eof():
+        await _drain(resp, drain)
+    return result
@@ -1,8 +1,30 @@
+import asyncio
 import aiohttp
 import re
 from typing import Dict
+import bot
+from model.LoginModel import LOGGED_OUT_NEEDLE
+from model.MetricsModel import SIGN_PHASE_SECONDS, SIGN_RESULTS
+from model.ScanModel import scan_response
+from model.TraceModel import span
 import var
 
+# Failures worth retrying later: the forum or the network was struggling, not the account.
+RETRYABLE_ERRORS = (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+
+# The sign page is read only until the sign button (or the guest login form) shows up.
+SIGN_PAGE_PATTERNS = {
+    "logged_out": LOGGED_OUT_NEEDLE,
+    "button": re.compile(rb'<a\s+href="([^"]+)"\s+class="btna">'),
+}
+# Captures the text inside the first <p> within the <div id="messagetext" ...>.
+SIGN_RESULT_PATTERNS = {
+    "message": re.compile(rb'<div\s+id="messagetext"[^>]*>.{0,512}?<p>(.{0,1024}?)</p>', re.DOTALL),
+}
+
+def is_retryable_status(status: int) -> bool:
+    return status == 429 or status >= 500
+
 class SignModel:
     def __init__(self, name: str, cookies: dict):
         self.name = name
@@ -10,6 +32,19 @@ class SignModel:
         self.status = False
 
     async def sign(self) -> Dict[str, object]:
+        """
+        Performs the sign operation and records its duration and outcome in the metrics.
+        See _sign() for the steps and the returned dictionary.
+        """
+        with SIGN_PHASE_SECONDS.time(phase="total"), span("sign"):
+            result = await self._sign()
+        if result["success"]:
+            SIGN_RESULTS.inc(outcome="success")
+        else:
+            SIGN_RESULTS.inc(outcome="retryable" if result["retryable"] else "failed")
+        return result
+
+    async def _sign(self) -> Dict[str, object]:
         """
         Performs the sign operation.
         
@@ -17,44 +52,58 @@ class SignModel:
         2. Extract the <a> tag with class "btna" (which contains the href for signing).
         3. Visit that URL.
         4. Extract the message text from the <div id="messagetext"> block.
+        Both pages are scanned while they stream in and only read up to what is needed.
         
         Returns:
             A dictionary with:
               - "success": bool, whether the sign operation was successful.
               - "info": str, the message extracted (or an error message if something failed).
+              - "retryable": bool, whether a failure was transient (timeout, connection error,
+                429/5xx) and the sign may succeed if tried again later.
+              - "logged_out": True only when Yamibo served the guest page, i.e. the cookies expired.
         """
         try:
-            async with aiohttp.ClientSession(cookies=self.cookie) as session:
-                async with session.get(var.SIGN_URL, timeout=15) as resp:
-                    text = await resp.text()
-
-                match = re.search(r'<a\s+href="([^"]+)"\s+class="btna">', text)
-                if not match:
-                    print(text)
-                    return {"success": False, "info": "Sign button not found. Possibly already signed or page structure changed."}
-
-                sign_href = match.group(1)
-                if not sign_href.startswith("http"):
-                    sign_href = sign_href.lstrip("./")
-                    sign_url = var.DOMAIN + sign_href
-                else:
-                    sign_url = sign_href
-
-                async with session.get(sign_url) as sign_resp:
-                    sign_text = await sign_resp.text()
-
-                # This regex captures the text inside the first <p> within the <div id="messagetext" ...>
-                message_match = re.search(r'<div\s+id="messagetext"[^>]*>.*?<p>(.*?)</p>', sign_text, re.DOTALL)
-                if message_match:
-                    message = message_match.group(1).strip()
-                    try:
-                        message = message.split("<script")[0]
-                    except: pass
-                    self.status = True
-                    return {"success": True, "info": message}
-                else:
-                    return {"success": False, "info": "Failed to extract sign result message. The page may not have the expected content."}
+            http = bot.http_client
+            with SIGN_PHASE_SECONDS.time(phase="sign_page"), span("sign_page"):
+                async with http.request("GET", var.SIGN_URL, cookies=self.cookie, timeout=15) as resp:
+                    if is_retryable_status(resp.status):
+                        return {"success": False, "retryable": True, "info": f"Sign page returned HTTP {resp.status}."}
+                    with span("parse_sign_page"):
+                        page = await scan_response(resp, SIGN_PAGE_PATTERNS, "sign_page")
+
+            if "logged_out" in page:
+                return {"success": False, "retryable": False, "logged_out": True, "info": "Cookie is not correct or already expired. Please /login again."}
+
+            if "button" not in page:
+                print(page.text())
+                return {"success": False, "retryable": False, "info": "Sign button not found. Possibly already signed or page structure changed."}
+
+            sign_href = page.group("button", 1)
+            if not sign_href.startswith("http"):
+                sign_href = sign_href.lstrip("./")
+                sign_url = var.DOMAIN + sign_href
+            else:
+                sign_url = sign_href
+
+            with SIGN_PHASE_SECONDS.time(phase="sign_request"), span("sign_request"):
+                async with http.request("GET", sign_url, cookies=self.cookie, timeout=15) as sign_resp:
+                    if is_retryable_status(sign_resp.status):
+                        return {"success": False, "retryable": True, "info": f"Sign request returned HTTP {sign_resp.status}."}
+                    with span("parse_result"):
+                        result = await scan_response(sign_resp, SIGN_RESULT_PATTERNS, "sign_result")
+
+            if "message" in result:
+                message = result.group("message", 1).strip()
+                try:
+                    message = message.split("<script")[0]
+                except: pass
+                self.status = True
+                return {"success": True, "retryable": False, "info": message}
+            else:
+                return {"success": False, "retryable": False, "info": "Failed to extract sign result message. The page may not have the expected content."}
+        except RETRYABLE_ERRORS as e:
+            return {"success": False, "retryable": True, "info": f"Error during sign operation: {str(e) or type(e).__name__}"}
         except Exception as e:
-            return {"success": False, "info": f"Error during sign operation: {str(e)}"}
+            return {"success": False, "retryable": False, "info": f"Error during sign operation: {str(e)}"}
     
     
\ No newline at end of file
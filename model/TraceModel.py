@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+# The tracer of the run this code belongs to; tasks created inside a run inherit it.
+_tracer: ContextVar["Tracer | None"] = ContextVar("tracer", default=None)
+# Arguments added to every span of the current task, e.g. the account being signed.
+_tags: ContextVar[dict] = ContextVar("trace_tags", default={})
+
+class Tracer:
+    """
+    Writes spans of one run to a file that chrome://tracing and ui.perfetto.dev can open.
+
+    Every asyncio task gets its own track, so concurrent sign workers show up side by side
+    and gaps between their spans are visible. Events are streamed to disk as they finish:
+    "json" writes the Chrome JSON array format (the closing bracket is optional for the
+    viewers, so a crashed run is still readable), "jsonl" writes one event per line.
+    """
+    def __init__(self, path: str, format: str = "json"):
+        """
+        :param path: File to write; its folder is created if needed.
+        :param format: "json" (Chrome trace array) or "jsonl".
+        """
+        if format not in ("json", "jsonl"):
+            raise ValueError(f"Unknown trace format: {format}")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.format = format
+        self.pid = os.getpid()
+        self._start = time.perf_counter_ns()
+        self._file = open(path, "w", encoding="utf-8", buffering=1 << 20)
+        self._first = True
+        self._lanes: weakref.WeakKeyDictionary[asyncio.Task, int] = weakref.WeakKeyDictionary()
+        self._next_lane = 1
+        if format == "json":
+            self._file.write("[\n")
+        self._emit({"ph": "M", "name": "process_name", "pid": self.pid, "tid": 0, "args": {"name": "yamibo autosign"}})
+
+    def now(self) -> float:
+        """
+        Microseconds since the tracer started, the unit Chrome traces use.
+        """
+        return (time.perf_counter_ns() - self._start) / 1000
+
+    def lane(self) -> int:
+        """
+        Track id of the current asyncio task, named after the task the first time it is seen.
+        """
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is None:
+            return 0
+        lane = self._lanes.get(task)
+        if lane is None:
+            lane = self._lanes[task] = self._next_lane
+            self._next_lane += 1
+            self._emit({"ph": "M", "name": "thread_name", "pid": self.pid, "tid": lane, "args": {"name": task.get_name()}})
+        return lane
+
+    def _emit(self, event: dict):
+        if self._file.closed:
+            return
+        line = json.dumps(event, ensure_ascii=False, separators=(",", ":"), default=str)
+        if self.format == "json":
+            self._file.write(line if self._first else ",\n" + line)
+        else:
+            self._file.write(line + "\n")
+        self._first = False
+
+    def complete(self, name: str, start: float, args: dict):
+        self._emit({"ph": "X", "name": name, "cat": "sign", "ts": start, "dur": self.now() - start,
+                    "pid": self.pid, "tid": self.lane(), "args": args})
+
+    def instant(self, name: str, args: dict):
+        self._emit({"ph": "i", "s": "t", "name": name, "cat": "sign", "ts": self.now(),
+                    "pid": self.pid, "tid": self.lane(), "args": args})
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self.format == "json":
+            self._file.write("\n]\n")
+        self._file.close()
+
+@contextmanager
+def tracing(tracer: Tracer | None) -> Iterator[Tracer | None]:
+    """
+    Make `tracer` the active tracer inside the with block (and in tasks created there),
+    then close it. With None, tracing stays off.
+    """
+    token = _tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _tracer.reset(token)
+        if tracer is not None:
+            tracer.close()
+            print(f"[Trace] Wrote {tracer.path}")
+
+def tag(**args):
+    """
+    Add `args` to every span recorded later in the current task.
+    """
+    if _tracer.get() is not None:
+        _tags.set({**_tags.get(), **args})
+
+@contextmanager
+def span(name: str, **args):
+    """
+    Record the with block as one span of the active tracer, awaits included.
+    Does nothing when no tracer is active.
+    """
+    tracer = _tracer.get()
+    if tracer is None:
+        yield
+        return
+    start = tracer.now()
+    try:
+        yield
+    finally:
+        tracer.complete(name, start, {**_tags.get(), **args})
+
+def instant(name: str, **args):
+    """
+    Record a point in time (e.g. a retry being scheduled) on the active tracer.
+    """
+    tracer = _tracer.get()
+    if tracer is not None:
+        tracer.instant(name, {**_tags.get(), **args})
+
+def run_tracer(trace_dir: str | None, run_name: str, format: str = "json") -> Tracer | None:
+    """
+    A tracer writing to `trace_dir`/<run_name>-<timestamp>.<format>, or None when tracing is off.
+    """
+    if not trace_dir:
+        return None
+    filename = f"{run_name}-{time.strftime('%Y%m%d-%H%M%S')}.{format}"
+    return Tracer(os.path.join(trace_dir, filename), format)
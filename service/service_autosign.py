@@ -1,86 +1,113 @@
 import asyncio
+import time
 from datetime import datetime, timedelta
 import discord
 import bot
-from model.SignModel import SignModel
+from model.MetricsModel import DISCORD_EDIT_SECONDS, RUN_LAST_SUCCESS, RUN_SECONDS
+from model.TraceModel import run_tracer, span, tracing
+from service.service_health import CookieHealthChecker, HealthReport
+from service.service_progress import ProgressReporter
+from service.service_scheduler import local_now, next_run_time, sleep_until, staggered
+from service.service_shard import coordinate_shards
+from service.service_sign_engine import GuildStats, SignEngine, SignStats
 import var
 
 class DailySignService:
     def __init__(self, bot: discord.Client):
         self.scheduled_time = var.AUTOSIGN_SCHEDULED_TIME
         self.channel_id = var.AUTOSIGN_NOTIFY_CHANNEL_ID
-        self.check_delay = var.AUTOSIGN_CHECK_DELAY
+        self.concurrency = var.AUTOSIGN_CONCURRENCY
+        self.page_size = var.AUTOSIGN_PAGE_SIZE
+        self.progress_interval = var.AUTOSIGN_PROGRESS_INTERVAL
+        self.flush_interval = var.AUTOSIGN_FLUSH_INTERVAL
+        self.flush_size = var.AUTOSIGN_FLUSH_SIZE
+        self.history_days = var.AUTOSIGN_HISTORY_DAYS
+        self.sign_window = var.AUTOSIGN_SIGN_WINDOW * 60
+        self.shards = var.AUTOSIGN_SHARDS
+        self.shard_spawn_local = var.AUTOSIGN_SHARD_SPAWN_LOCAL
+        self.shard_timeout = var.AUTOSIGN_SHARD_TIMEOUT
+        self.trace_dir = var.AUTOSIGN_TRACE_DIR
+        self.health_check_lead = var.AUTOSIGN_HEALTH_CHECK_LEAD * 60
+        self.notify_dead_accounts = var.AUTOSIGN_NOTIFY_DEAD_ACCOUNTS
+        self.last_health_report: HealthReport | None = None
+        self.trace_format = var.AUTOSIGN_TRACE_FORMAT
         self.bot = bot
+        # Held for the whole sign run, so a second run never overlaps one in progress.
+        self.run_lock = asyncio.Lock()
 
     async def start_service(self):
         """
-        Main loop:
-         1. Calculate the initial next_run time.
-         2. Wait until next_run using an adaptive smart delay loop.
-         3. When the time is reached, run the sign process.
-         4. After processing, calculate the next_run for the following day and loop.
+        Main loop, run by a ServiceSupervisor that restarts it after a crash:
+         0. Wait until the bot is connected, so channels can be resolved. If today's run was
+            interrupted (process restart or crash), resume it right away with the accounts
+            the ledger has not seen signed.
+         1. Sleep until `health_check_lead` before the next scheduled time (local wall clock,
+            DST aware) and mark accounts with expired cookies, so the run skips them.
+         2. Sleep until the scheduled time and run the sign process, spread over the sign window.
+         3. Schedule the next occurrence after the run and loop.
         """
-        now = datetime.now()
+        await self.bot.wait_until_ready()
+        if await self.interrupted_run(datetime.now().date().isoformat()):
+            print("[Service] Today's sign run did not finish, resuming it now.")
+            await self.run_sign_process()
         target_time_obj = datetime.strptime(self.scheduled_time, "%H:%M:%S").time()
-
-        # Initial calculation for current_next_run
-        current_next_run = datetime.combine(now.date(), target_time_obj)
-        if current_next_run < now:
-            current_next_run += timedelta(days=1)
-        
-        print(f"[Service] Initializing. First run scheduled at: {current_next_run}")
+        next_run = next_run_time(target_time_obj, local_now())
+        print(f"[Service] Initializing. First run scheduled at: {next_run}")
 
         while True:
-            now = datetime.now() 
-            delay = (current_next_run - now).total_seconds()
-
-            if delay > 0:
-                print(f"[Service] Current time: {now}. Next run at: {current_next_run}. Waiting for {delay:.0f} seconds.")
-                while delay > 0:
-                    sleep_interval = min(60, delay) 
-                    await asyncio.sleep(sleep_interval)
-                    now = datetime.now() 
-                    delay = (current_next_run - now).total_seconds() 
-                    if delay > 0: 
-                        print(f"[Service] Checking... {delay:.2f} seconds remaining until {current_next_run}.")
-            
-            print(f"[Service] Scheduled time {current_next_run} reached (current time: {datetime.now()}). Running sign process.")
+            if self.health_check_lead:
+                await sleep_until(next_run - timedelta(seconds=self.health_check_lead))
+                if local_now() < next_run:
+                    await self.check_cookie_health(stop_at=next_run)
+            await sleep_until(next_run)
+
+            print(f"[Service] Scheduled time {next_run} reached (current time: {datetime.now()}). Running sign process.")
             await self.run_sign_process()
-            process_completion_time = datetime.now()
-            print(f"[Service] Sign process completed at {process_completion_time}.")
+            print(f"[Service] Sign process completed at {datetime.now()}.")
 
-            current_next_run = datetime.combine(current_next_run.date() + timedelta(days=1), target_time_obj)
-            print(f"[Service] Next run scheduled for: {current_next_run}.")
-            
-            await asyncio.sleep(1)
+            # Never before the run that just happened, even if the clock was set back.
+            next_run = next_run_time(target_time_obj, max(next_run, local_now()))
+            print(f"[Service] Next run scheduled for: {next_run}.")
+
+    async def interrupted_run(self, sign_date: str) -> bool:
+        """
+        Whether a run for `sign_date` started (it is in shard_runs) but did not finish, and
+        accounts are left to sign. A finished run with failed accounts does not count.
+        """
+        runs = await bot.db.get_shard_runs(sign_date)
+        if not runs or all(run["status"] == "done" for run in runs.values()):
+            return False
+        return await bot.db.count_autosign_accounts(skip_signed_on=sign_date) > 0
 
     async def run_sign_process(self):
         """
         Processes all accounts by performing the sign action for each.
-        Updates a progress embed in a specified Discord channel.
+        Updates a progress embed in the configured log channel, when there is one.
+        With trace_dir set, the run's spans are written to a Chrome trace file there.
+        Skipped when another run is still in progress.
         """
-        print(f"[Service] Sign process started at {datetime.now()}")
-        
-        channel = self.bot.get_channel(self.channel_id)
-        if not channel:
-            print("[Service] Error: Log channel not found.")
+        if self.run_lock.locked():
+            print("[Service] A sign run is already in progress, skipping this one.")
             return
+        async with self.run_lock:
+            with tracing(run_tracer(self.trace_dir, "sign-run", self.trace_format)), span("run_sign_process"):
+                await self._run_sign_process()
+
+    async def _run_sign_process(self):
+        started_at = time.time()
+        print(f"[Service] Sign process started at {datetime.now()}")
         
-        loading_embed = discord.Embed(
-            title="Daily Sign Process",
-            description="Loading accounts from database...",
-            color=discord.Color.gold()
-        )
-        loading_embed.set_footer(text="Please wait...")
-        loading_message = await channel.send(embed=loading_embed)
-        
-        accounts = await bot.db.get_autosign_accounts()
-        
-        total = len(accounts)
-        success_count = 0
-        failed_count = 0
-        details = []
-        
+        with span("load_accounts"):
+            notify_channels = await bot.db.get_notify_channels()
+            sign_date = datetime.now().date().isoformat()
+            total = await bot.db.count_autosign_accounts(skip_signed_on=sign_date)
+            already_signed = await bot.db.count_autosign_accounts() - total
+        if already_signed:
+            print(f"[Service] {already_signed} accounts already signed on {sign_date}, resuming with the remaining {total}.")
+        # Recorded as started before any Discord I/O, so a restart after a crash anywhere in the
+        # run resumes it (see interrupted_run). In a sharded run worker 0 replaces the row with its own.
+        await bot.db.save_shard_run(sign_date, 0, max(1, self.shards), "running", total)
+
         progress_embed = discord.Embed(
             title="Daily Sign Progress",
             description="Starting sign process...",
@@ -90,53 +117,152 @@ class DailySignService:
         progress_embed.add_field(name="Success", value="0", inline=True)
         progress_embed.add_field(name="Failed", value="0", inline=True)
         progress_embed.set_footer(text="Progress: 0%")
-        await loading_message.edit(embed=progress_embed)
-
-        max_retries = 3
-        retry_delay = 5
-
-        for idx, account in enumerate(accounts, start=1):
-            sign_instance = SignModel(account.username, account.cookies)
-            
-            result = {"success": False, "info": "Initial attempt failed"}
-            for attempt in range(max_retries):
-                result = await sign_instance.sign()
-                if result.get("success"):
-                    break
-                elif attempt < max_retries - 1:
-                    print(f"[Service] Sign failed for {account.username}, retrying in {retry_delay} seconds...")
-                    await asyncio.sleep(retry_delay)
-
-            if result.get("success"):
-                success_count += 1
-                details.append(f"{account.username}: Success - {result.get('info', 'Sign-in succeeded.')}")
+
+        # The global progress channel is optional, and a failure to post to it does not stop
+        # the run; without it only the per-guild summaries are sent.
+        channel = self.bot.get_channel(self.channel_id) if self.channel_id else None
+        progress_message = None
+        if channel:
+            try:
+                with span("discord_send", kind="start"):
+                    progress_message = await channel.send(embed=progress_embed)
+            except Exception as e:
+                print(f"[Service] Sending the progress message failed, signing without it: {e!r}")
+        else:
+            print("[Service] Log channel not set or not found, signing without the global progress message.")
+
+        stats = SignStats(total)
+        reporter = None
+        if progress_message:
+            reporter = ProgressReporter(progress_message, progress_embed, stats, self.update_progress_embed, interval=self.progress_interval)
+            reporter.start()
+        try:
+            if self.shards > 1:
+                with span("coordinate_shards", shards=self.shards):
+                    stats = await coordinate_shards(
+                        stats, sign_date, since=int(started_at), shard_count=self.shards,
+                        spawn_local=self.shard_spawn_local, timeout=self.sign_window + self.shard_timeout,
+                        poll_interval=self.progress_interval
+                    )
             else:
-                failed_count += 1
-                details.append(f"{account.username}: Failed after {max_retries} attempts - {result.get('info', 'Sign-in failed.')}")
-                
-            await asyncio.sleep(self.check_delay)
-
-            if idx % 100 == 0 or idx == total:
-                progress_percentage = (idx / total) * 100
-                bar_length = 20
-                filled_length = int(round(bar_length * idx / total))
-                progress_bar = "█" * filled_length + "-" * (bar_length - filled_length)
-                progress_embed.description = f"Progress: [{progress_bar}] {progress_percentage:.1f}%"
-                progress_embed.set_field_at(1, name="Success", value=str(success_count), inline=True)
-                progress_embed.set_field_at(2, name="Failed", value=str(failed_count), inline=True)
-                progress_embed.set_footer(text=f"Processed {idx}/{total} accounts")
-                await loading_message.edit(embed=progress_embed)
-                
+                try:
+                    with span("sign_accounts", total=total):
+                        await self.sign_accounts(stats, sign_date)
+                except BaseException:
+                    await bot.db.save_shard_run(sign_date, 0, 1, "failed", total, stats.success, stats.failed)
+                    raise
+                await bot.db.save_shard_run(sign_date, 0, 1, "done", total, stats.success, stats.failed)
+        finally:
+            if reporter:
+                await reporter.stop()
+
+        if progress_message:
+            try:
+                await self.send_final_report(channel, progress_message, progress_embed, stats)
+            except Exception as e:
+                print(f"[Service] Sending the final report failed: {e!r}")
+        with span("send_guild_summaries", guilds=len(stats.guilds)):
+            await self.send_guild_summaries(stats, notify_channels)
+        with span("compact_sign_history"):
+            await self.compact_sign_history(sign_date)
+        RUN_SECONDS.observe(time.time() - started_at, kind="autosign")
+        RUN_LAST_SUCCESS.set(time.time(), kind="autosign")
+        print(f"[Service] Sign process completed at {datetime.now()}. Rate limiter: {bot.http_client.limiter.snapshot()}")
+
+    async def send_final_report(self, channel: discord.abc.Messageable, progress_message: discord.Message,
+                                progress_embed: discord.Embed, stats: SignStats):
+        """
+        Turn the progress message into the run's summary and post the last sign details below it.
+        """
+        self.update_progress_embed(progress_embed, stats)
         progress_embed.title = "Daily Sign Completed"
         progress_embed.description += "\nProcess finished."
-        progress_embed.set_footer(text=f"Total: {total} | Success: {success_count} | Failed: {failed_count}")
-        await loading_message.edit(embed=progress_embed)
+        progress_embed.set_footer(text=f"Total: {stats.total} | Success: {stats.success} | Failed: {stats.failed}")
+        with DISCORD_EDIT_SECONDS.time(kind="final"), span("discord_edit", kind="final"):
+            await progress_message.edit(embed=progress_embed)
 
-        final_details = "\n".join(details[-20:])
+        final_details = "\n".join(stats.details)
         detail_embed = discord.Embed(
             title="Last 20 Sign Details",
             description=final_details if final_details else "No details available.",
             color=discord.Color.green()
         )
-        await channel.send(embed=detail_embed)
-        print(f"[Service] Sign process completed at {datetime.now()}")
\ No newline at end of file
+        with span("discord_send", kind="details"):
+            await channel.send(embed=detail_embed)
+
+    async def compact_sign_history(self, sign_date: str):
+        """
+        Drop sign ledger rows older than `history_days`; /stats reads the rollups, which are kept.
+        """
+        if not self.history_days:
+            return
+        before = (datetime.fromisoformat(sign_date) - timedelta(days=self.history_days)).date().isoformat()
+        try:
+            await bot.db.compact_sign_history(before)
+        except Exception as e:
+            print(f"[Service] Sign history compaction failed: {e}")
+
+    async def check_cookie_health(self, stop_at: datetime | None = None):
+        checker = CookieHealthChecker(self.bot, self.concurrency, self.page_size, notify_owners=self.notify_dead_accounts)
+        try:
+            self.last_health_report = await checker.run(stop_at=stop_at)
+        except Exception as e:
+            print(f"[Service] Cookie health scan failed: {e}")
+
+    async def sign_accounts(self, stats: SignStats, sign_date: str):
+        """
+        Signs every autosign account not yet signed on `sign_date` in this process.
+        Results are written back in batches through a SignWriteBuffer.
+        """
+        engine = SignEngine(concurrency=self.concurrency)
+        accounts = bot.db.iter_autosign_accounts(page_size=self.page_size, skip_signed_on=sign_date)
+        if self.sign_window:
+            accounts = staggered(accounts, self.sign_window)
+        async with bot.db.sign_buffer(self.flush_size, self.flush_interval) as results:
+            async def record_result(account, result: dict):
+                await results.add(account, sign_date, result)
+
+            await engine.run(accounts, stats, on_result=record_result)
+
+    async def send_guild_summaries(self, stats: SignStats, notify_channels: dict[int, int]):
+        """
+        Sends one summary embed per guild that has a notification channel set,
+        covering only that guild's accounts.
+        """
+        async def send_summary(guild_id: int, guild_stats: GuildStats):
+            channel = self.bot.get_channel(notify_channels[guild_id])
+            if not channel:
+                print(f"[Service] Notify channel {notify_channels[guild_id]} of guild {guild_id} not found.")
+                return
+            details = "\n".join(guild_stats.details)
+            summary_embed = discord.Embed(
+                title="Daily Sign Summary",
+                description=details if details else "No details available.",
+                color=discord.Color.green() if not guild_stats.failed else discord.Color.orange()
+            )
+            summary_embed.add_field(name="Success", value=str(guild_stats.success), inline=True)
+            summary_embed.add_field(name="Failed", value=str(guild_stats.failed), inline=True)
+            summary_embed.set_footer(text=f"Last {len(guild_stats.details)} sign details of this server")
+            await channel.send(embed=summary_embed)
+
+        results = await asyncio.gather(*(
+            send_summary(guild_id, guild_stats)
+            for guild_id, guild_stats in stats.guilds.items()
+            if guild_id in notify_channels
+        ), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"[Service] Sending guild summary failed: {result}")
+
+    @staticmethod
+    def update_progress_embed(progress_embed: discord.Embed, stats: SignStats):
+        processed, total = stats.processed, stats.total
+        progress_percentage = (processed / total) * 100 if total else 100.0
+        bar_length = 20
+        filled_length = int(round(bar_length * processed / total)) if total else bar_length
+        progress_bar = "█" * filled_length + "-" * (bar_length - filled_length)
+        progress_embed.description = f"Progress: [{progress_bar}] {progress_percentage:.1f}%"
+        progress_embed.set_field_at(1, name="Success", value=str(stats.success), inline=True)
+        progress_embed.set_field_at(2, name="Failed", value=str(stats.failed), inline=True)
+        limiter = bot.http_client.limiter.snapshot()
+        progress_embed.set_footer(text=f"Processed {processed}/{total} accounts | {limiter['rate']} req/s, {limiter['concurrency']} concurrent")
\ No newline at end of file
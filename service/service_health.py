@@ -0,0 +1,136 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+
+import discord
+
+import bot
+from model.DataModel import Account
+from model.HttpModel import BULK, request_lane
+from model.LoginModel import check_cookies
+from model.MetricsModel import HEALTH_CHECKS
+from model.TraceModel import span
+from service.service_scheduler import local_now
+
+class HealthReport:
+    """
+    Outcome of one cookie health scan.
+    """
+    def __init__(self):
+        self.alive = 0
+        self.unknown = 0
+        self.dead: list[Account] = []
+        # DMs to the owners of dead accounts, sent in the background so the sign run is not held up.
+        self.notify_task: asyncio.Task | None = None
+
+class CookieHealthChecker:
+    """
+    Checks the cookies of every autosign account before the sign window and marks the
+    dead ones (guest page served) as not good, so the sign run skips them instead of
+    spending its attempts and retry backoffs on them. Requests go through the shared
+    HTTP client and its rate limiter like the sign requests.
+    """
+    def __init__(self, bot: discord.Client, concurrency: int, page_size: int = 500, notify_owners: bool = False):
+        """
+        :param bot: Used to DM owners of dead accounts.
+        :param concurrency: Number of accounts checked at the same time.
+        :param page_size: Accounts fetched from the database per page.
+        :param notify_owners: DM each owner a reminder to /login again.
+        """
+        self.bot = bot
+        self.concurrency = max(1, int(concurrency))
+        self.page_size = page_size
+        self.notify_owners = notify_owners
+
+    async def run(self, stop_at: datetime | None = None) -> HealthReport:
+        """
+        Check every autosign account that is still marked good.
+
+        :param stop_at: Aware datetime (the sign run) after which no further accounts are
+                        checked; the accounts not reached stay as they are.
+        """
+        print("[Service] Cookie health scan started.")
+        report = HealthReport()
+        queue: asyncio.Queue[Account | None] = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def worker():
+            while True:
+                account = await queue.get()
+                if account is None:
+                    return
+                try:
+                    with span("health_check", account=account.username), request_lane(BULK):
+                        alive = await check_cookies(account.cookies)
+                except Exception as e:
+                    # An unreadable row must not take the worker, and with it the scan, down.
+                    print(f"[Service] Cookie health check crashed for {account.username}: {e!r}")
+                    alive = None
+                if alive is None:
+                    # The forum did not answer properly; let the sign run decide.
+                    report.unknown += 1
+                    HEALTH_CHECKS.inc(outcome="unknown")
+                elif alive:
+                    report.alive += 1
+                    HEALTH_CHECKS.inc(outcome="alive")
+                else:
+                    report.dead.append(account)
+                    HEALTH_CHECKS.inc(outcome="dead")
+
+        async def enqueue(account: Account) -> bool:
+            """
+            Queue `account` for the workers; False when stop_at came first, even while the queue is full.
+            """
+            if stop_at is None:
+                await queue.put(account)
+                return True
+            remaining = (stop_at - local_now()).total_seconds()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(queue.put(account), timeout=remaining)
+            except asyncio.TimeoutError:
+                return False
+            return True
+
+        with span("health_scan"):
+            workers = [asyncio.create_task(worker(), name=f"health-worker-{index}") for index in range(self.concurrency)]
+            try:
+                async for account in bot.db.iter_autosign_accounts(page_size=self.page_size):
+                    if not await enqueue(account):
+                        print("[Service] Cookie health scan reached the sign run, the remaining accounts are left unchecked.")
+                        break
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+
+            await bot.db.mark_accounts_bad([account.id for account in report.dead])
+
+        print(f"[Service] Cookie health scan done. Alive: {report.alive} | Dead: {len(report.dead)} | Unknown: {report.unknown}")
+        if self.notify_owners and report.dead:
+            report.notify_task = asyncio.create_task(self.notify_dead_accounts(report.dead), name="health-notify")
+        return report
+
+    async def notify_dead_accounts(self, accounts: list[Account]):
+        """
+        DM every owner one message listing their accounts whose cookies expired.
+        """
+        usernames: dict[int, list[str]] = defaultdict(list)
+        for account in accounts:
+            usernames[account.discord_user_id].append(account.username)
+
+        for user_id, names in usernames.items():
+            embed = discord.Embed(
+                title="Auto Sign Paused",
+                description="The login of these Yamibo accounts has expired, so they are skipped by auto sign:\n"
+                            + "\n".join(f"• {name}" for name in names)
+                            + "\nPlease /login again to resume.",
+                color=discord.Color.orange()
+            )
+            try:
+                user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+                await user.send(embed=embed)
+            except discord.HTTPException as e:
+                print(f"[Service] Could not DM user {user_id} about expired accounts: {e}")
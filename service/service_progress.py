@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import Callable
+
+import discord
+
+from model.MetricsModel import DISCORD_EDIT_ERRORS, DISCORD_EDIT_SECONDS
+from model.TraceModel import span
+from service.service_sign_engine import SignStats
+
+class ProgressReporter:
+    """
+    Pushes a sign run's progress to its Discord message from one background task.
+
+    Sign workers only bump the counters in SignStats; this task edits the message at most
+    once per `interval` seconds, skips the edit when nothing changed, and stretches the
+    interval when Discord rate limits or slows down the edits.
+    """
+    def __init__(self, message: discord.Message, embed: discord.Embed, stats: SignStats,
+                 render: Callable[[discord.Embed, SignStats], None], interval: float = 5.0, max_interval: float = 60.0):
+        """
+        :param message: The message holding the progress embed.
+        :param embed: The progress embed, updated in place by `render`.
+        :param stats: Counters of the running sign process.
+        :param render: Writes `stats` into `embed`.
+        :param interval: Minimum seconds between two edits.
+        :param max_interval: Upper bound the interval backs off to.
+        """
+        self.message = message
+        self.embed = embed
+        self.stats = stats
+        self.render = render
+        self.base_interval = interval
+        self.interval = interval
+        self.max_interval = max_interval
+        self._last_pushed = None
+        self._task: asyncio.Task | None = None
+
+    def _state(self) -> tuple[int, int, int]:
+        return self.stats.processed, self.stats.success, self.stats.failed
+
+    def start(self):
+        self._last_pushed = self._state()
+        self._task = asyncio.create_task(self._loop(), name="progress-reporter")
+
+    async def stop(self):
+        """
+        Stop the background task. The caller does the final edit itself.
+        A task that failed is only logged; progress reporting never fails the run.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                print(f"[Service] Progress reporter stopped with an error: {e!r}")
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.push()
+            except Exception as e:
+                self.interval = min(self.max_interval, self.interval * 2)
+                print(f"[Service] Progress update failed: {e!r}")
+
+    async def push(self):
+        state = self._state()
+        if state == self._last_pushed:
+            return
+
+        self.render(self.embed, self.stats)
+        started = time.monotonic()
+        try:
+            with DISCORD_EDIT_SECONDS.time(kind="progress"), span("discord_edit", kind="progress"):
+                await self.message.edit(embed=self.embed)
+        except discord.HTTPException as e:
+            DISCORD_EDIT_ERRORS.inc(kind="progress", status=e.status)
+            if e.status == 429:
+                retry_after = getattr(e, "retry_after", 0) or 0
+                self.interval = min(self.max_interval, max(self.interval * 2, retry_after))
+                print(f"[Service] Progress edit rate limited, next update in {self.interval:.0f} seconds.")
+            else:
+                print(f"[Service] Progress edit failed: {e}")
+            return
+        except Exception as e:
+            # Connection errors and timeouts discord.py gave up retrying; back off like a slow edit.
+            DISCORD_EDIT_ERRORS.inc(kind="progress", status="error")
+            self.interval = min(self.max_interval, self.interval * 2)
+            print(f"[Service] Progress edit failed: {e!r}")
+            return
+
+        self._last_pushed = state
+        elapsed = time.monotonic() - started
+        # discord.py waits out 429s internally; a slow edit means we are pushing too often.
+        if elapsed > self.interval:
+            self.interval = min(self.max_interval, self.interval * 2)
+        else:
+            self.interval = max(self.base_interval, self.interval / 2)
@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime, time, timedelta
+from typing import AsyncIterable, AsyncIterator
+
+from model.DataModel import SIGN_SLOTS, Account
+from model.TraceModel import span
+
+# Longest single sleep; after waking the wall clock is read again, so clock jumps are noticed.
+MAX_SLEEP = 600
+
+def local_now() -> datetime:
+    return datetime.now().astimezone()
+
+def next_run_time(target: time, after: datetime) -> datetime:
+    """
+    The first local occurrence of `target` strictly after `after` (an aware datetime).
+    The UTC offset is resolved per day, so runs stay at the same wall clock time across DST.
+    A time skipped by a DST jump runs at the equivalent moment after the jump; a time that
+    occurs twice runs at its first occurrence.
+    """
+    day = after.astimezone().date()
+    while True:
+        naive = datetime.combine(day, target)
+        candidate = naive.astimezone()
+        if candidate.replace(tzinfo=None) != naive:
+            candidate = naive.replace(fold=1).astimezone()
+        if candidate > after:
+            return candidate
+        day += timedelta(days=1)
+
+async def sleep_until(deadline: datetime):
+    """
+    Sleep until the wall clock reaches `deadline` (an aware datetime).
+    """
+    while True:
+        remaining = (deadline - local_now()).total_seconds()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(min(remaining, MAX_SLEEP))
+
+def sign_offset(account: Account, window: float) -> float:
+    """
+    Seconds after the start of the sign window at which `account` is due.
+    """
+    return account.sign_slot / SIGN_SLOTS * window
+
+async def staggered(accounts: AsyncIterable[Account], window: float) -> AsyncIterator[Account]:
+    """
+    Passes accounts through, holding each one back until its offset in a window of `window`
+    seconds starting now. `accounts` must come in sign slot order (iter_autosign_accounts does).
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    async for account in accounts:
+        delay = start + sign_offset(account, window) - loop.time()
+        if delay > 0:
+            with span("stagger_wait", account=account.username):
+                await asyncio.sleep(delay)
+        yield account
@@ -0,0 +1,184 @@
+"""
+Sharded autosign.
+
+With `shards: K` in setup/autosign.yaml the nightly run is split over K worker processes.
+Each worker signs only the accounts that shard_of(username, K) assigns to it and writes its
+results to the sign ledger in the accounts database; the bot coordinates and posts the
+single Discord report built from the ledger.
+
+All workers must run on the bot's machine: they share the SQLite database in WAL mode,
+which needs a local disk and does not work over a network filesystem. The bot spawns them
+(`shard_spawn_local: true`), or with `shard_spawn_local: false` they are started separately,
+e.g. under a process manager, and run on their own schedule:
+
+    python -m service.service_shard --shard 1 --shards 4 --schedule
+
+To try sharding locally without Discord, spawn K workers and print the aggregate:
+
+    python -m service.service_shard --local 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+import bot
+import var
+from model.MetricsModel import RUN_SECONDS
+from model.TraceModel import run_tracer, span, tracing
+from service.service_scheduler import local_now, next_run_time, sleep_until, staggered
+from service.service_sign_engine import SignEngine, SignStats
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+async def run_shard(shard_index: int, shard_count: int, sign_date: str) -> SignStats:
+    """
+    Sign the accounts of one shard for `sign_date` and report the shard's state in shard_runs.
+    """
+    shard = (shard_index, shard_count)
+    total = await bot.db.count_autosign_accounts(skip_signed_on=sign_date, shard=shard)
+    await bot.db.save_shard_run(sign_date, shard_index, shard_count, "running", total)
+    print(f"[Shard {shard_index}/{shard_count}] Signing {total} accounts for {sign_date}.")
+
+    stats = SignStats(total)
+    started = time.monotonic()
+
+    accounts = bot.db.iter_autosign_accounts(page_size=var.AUTOSIGN_PAGE_SIZE, skip_signed_on=sign_date, shard=shard)
+    if var.AUTOSIGN_SIGN_WINDOW:
+        accounts = staggered(accounts, var.AUTOSIGN_SIGN_WINDOW * 60)
+    tracer = run_tracer(var.AUTOSIGN_TRACE_DIR, f"sign-shard-{shard_index}-of-{shard_count}", var.AUTOSIGN_TRACE_FORMAT)
+    try:
+        with tracing(tracer), span("run_shard", shard=shard_index, shards=shard_count):
+            async with bot.db.sign_buffer(var.AUTOSIGN_FLUSH_SIZE, var.AUTOSIGN_FLUSH_INTERVAL) as results:
+                async def record_result(account, result: dict):
+                    await results.add(account, sign_date, result)
+
+                await SignEngine(concurrency=var.AUTOSIGN_CONCURRENCY).run(accounts, stats, on_result=record_result)
+    except BaseException:
+        await bot.db.save_shard_run(sign_date, shard_index, shard_count, "failed", total, stats.success, stats.failed)
+        raise
+    await bot.db.save_shard_run(sign_date, shard_index, shard_count, "done", total, stats.success, stats.failed)
+    RUN_SECONDS.observe(time.monotonic() - started, kind="shard")
+    print(f"[Shard {shard_index}/{shard_count}] Done. Success: {stats.success} | Failed: {stats.failed}")
+    return stats
+
+async def spawn_local_workers(shard_count: int, sign_date: str) -> list[asyncio.subprocess.Process]:
+    processes = []
+    try:
+        for shard_index in range(shard_count):
+            processes.append(await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "service.service_shard",
+                "--shard", str(shard_index), "--shards", str(shard_count), "--date", sign_date,
+                cwd=PROJECT_ROOT,
+            ))
+    except BaseException:
+        await stop_workers(processes, kill=True)
+        raise
+    return processes
+
+async def stop_workers(processes: list[asyncio.subprocess.Process], kill: bool = False):
+    """
+    End the workers still running and wait for them to exit.
+
+    :param kill: SIGKILL instead of SIGTERM, when the coordinator itself is going away and
+        must not leave workers signing on their own.
+    """
+    for process in processes:
+        if process.returncode is None:
+            if kill:
+                process.kill()
+            else:
+                process.terminate()
+    for process in processes:
+        await process.wait()
+
+async def coordinate_shards(stats: SignStats, sign_date: str, since: int, shard_count: int,
+                            spawn_local: bool, timeout: float, poll_interval: float = 5) -> SignStats:
+    """
+    Wait until every shard of `sign_date` has finished, keeping the counters of `stats`
+    current from the ledger so a ProgressReporter can show them.
+
+    :param since: Unix time the run started; older ledger entries and shard states are ignored.
+    :param spawn_local: Start the workers as child processes instead of waiting for separately started ones.
+    :param timeout: Seconds to wait before reporting whatever has been recorded.
+    Returns:
+        SignStats rebuilt from the ledger, with details and per-guild counts of every shard.
+    """
+    processes = await spawn_local_workers(shard_count, sign_date) if spawn_local else []
+    deadline = time.monotonic() + timeout
+
+    try:
+        while True:
+            success, failed = await bot.db.count_signs(sign_date, since)
+            stats.success, stats.failed, stats.processed = success, failed, success + failed
+
+            runs = await bot.db.get_shard_runs(sign_date)
+            finished = {
+                shard_index for shard_index, run in runs.items()
+                if run["status"] in ("done", "failed") and run["updatedAt"] >= since
+            }
+            finished.update(shard_index for shard_index, process in enumerate(processes) if process.returncode is not None)
+            if len(finished) >= shard_count:
+                break
+            if time.monotonic() > deadline:
+                print(f"[Service] Timed out waiting for shards {sorted(set(range(shard_count)) - finished)}.")
+                break
+            await asyncio.sleep(poll_interval)
+    except BaseException:
+        # Cancelled (bot shutting down) or crashed: orphaned workers would keep signing
+        # next to the ones a restart spawns.
+        await stop_workers(processes, kill=True)
+        raise
+    await stop_workers(processes)
+
+    result = SignStats(stats.total, stats.details_size)
+    async for account, sign_result in bot.db.iter_sign_results(sign_date, since):
+        result.record(account, sign_result, sign_result["attempts"])
+    return result
+
+def scale_rate_limit(shard_count: int):
+    """
+    Split the configured request rate between the workers so K shards together stay within it.
+    """
+    limiter = bot.http_client.limiter
+    limiter.rate /= shard_count
+    limiter.min_rate /= shard_count
+    limiter.max_rate /= shard_count
+
+async def main(args: argparse.Namespace):
+    await bot.db.create_table()
+    try:
+        if args.local:
+            sign_date = datetime.now().date().isoformat()
+            since = int(time.time())
+            stats = SignStats(await bot.db.count_autosign_accounts(skip_signed_on=sign_date))
+            stats = await coordinate_shards(stats, sign_date, since, args.local, spawn_local=True, timeout=float("inf"))
+            print(f"[Service] {args.local} shards done. Total: {stats.total} | Success: {stats.success} | Failed: {stats.failed}")
+            return
+
+        scale_rate_limit(args.shards)
+        if not args.schedule:
+            await run_shard(args.shard, args.shards, args.date or datetime.now().date().isoformat())
+            return
+
+        target_time_obj = datetime.strptime(var.AUTOSIGN_SCHEDULED_TIME, "%H:%M:%S").time()
+        next_run = next_run_time(target_time_obj, local_now())
+        while True:
+            print(f"[Shard {args.shard}/{args.shards}] Next run scheduled for: {next_run}.")
+            await sleep_until(next_run)
+            await run_shard(args.shard, args.shards, datetime.now().date().isoformat())
+            next_run = next_run_time(target_time_obj, max(next_run, local_now()))
+    finally:
+        await bot.http_client.close()
+        await bot.db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one shard of the autosign service.")
+    parser.add_argument("--shard", type=int, default=0, help="Index of this worker's shard.")
+    parser.add_argument("--shards", type=int, default=1, help="Total number of shards.")
+    parser.add_argument("--date", help="ISO date to sign for (default: today).")
+    parser.add_argument("--schedule", action="store_true", help="Run every day at scheduled_time instead of once, next to the bot on the same host.")
+    parser.add_argument("--local", type=int, metavar="K", help="Spawn K local shard workers and print the aggregate.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,224 @@
+import asyncio
+import random
+from collections import deque
+from typing import AsyncIterable, Awaitable, Callable
+
+import bot
+from model.DataModel import Account
+from model.HttpModel import BULK, INTERACTIVE, LANE_NAMES, request_lane
+from model.MetricsModel import SIGN_QUEUE_DEPTH, SIGN_RETRIES_PENDING, SIGNS_IN_FLIGHT
+from model.SignModel import SignModel
+from model.TraceModel import instant, span, tag
+
+class GuildStats:
+    """
+    Per-guild share of a sign run, reported to that guild's notification channel.
+    """
+    def __init__(self, details_size: int = 20):
+        self.success = 0
+        self.failed = 0
+        self.details: deque[str] = deque(maxlen=details_size)
+
+class SignStats:
+    """
+    Counters shared by every worker of one sign run.
+    Workers only touch these between awaits, so no lock is needed.
+    """
+    def __init__(self, total: int, details_size: int = 20):
+        """
+        :param total: Number of accounts scheduled for this run.
+        :param details_size: How many of the most recent detail lines to keep.
+        """
+        self.total = total
+        self.processed = 0
+        self.success = 0
+        self.failed = 0
+        self.details_size = details_size
+        self.details: deque[str] = deque(maxlen=details_size)
+        self.guilds: dict[int, GuildStats] = {}
+
+    def record(self, account: Account, result: dict, attempts: int):
+        guild = self.guilds.get(account.discord_guild_id)
+        if guild is None:
+            guild = self.guilds[account.discord_guild_id] = GuildStats(self.details_size)
+
+        self.processed += 1
+        if result.get("success"):
+            self.success += 1
+            guild.success += 1
+            detail = f"{account.username}: Success - {result.get('info', 'Sign-in succeeded.')}"
+        else:
+            self.failed += 1
+            guild.failed += 1
+            detail = f"{account.username}: Failed after {attempts} attempt(s) - {result.get('info', 'Sign-in failed.')}"
+        self.details.append(detail)
+        guild.details.append(detail)
+
+class SignScheduler:
+    """
+    The single path every sign takes: interactive ones (/sign) and bulk ones (autosign
+    runs and shards).
+
+    All signs share bot.http_client, so they share one connection pool and one rate
+    limiter. The lane of a sign decides its place in the limiter's queue. An interactive
+    sign waits only for bulk requests already in flight, never behind bulk requests that
+    are still queued, so /sign stays fast in the middle of a large run.
+    """
+    def __init__(self):
+        self.in_flight = [0] * len(LANE_NAMES)
+
+    async def sign(self, account: Account, lane: int = INTERACTIVE) -> dict:
+        """
+        Sign `account` once in `lane` (INTERACTIVE or BULK).
+        Returns:
+            The result of SignModel.sign().
+        """
+        self.in_flight[lane] += 1
+        SIGNS_IN_FLIGHT.set(self.in_flight[lane], lane=LANE_NAMES[lane])
+        try:
+            with request_lane(lane):
+                return await SignModel(account.username, account.cookies).sign()
+        finally:
+            self.in_flight[lane] -= 1
+            SIGNS_IN_FLIGHT.set(self.in_flight[lane], lane=LANE_NAMES[lane])
+
+class _SignRun:
+    """
+    Bookkeeping for one SignEngine.run() call.
+    """
+    def __init__(self, concurrency: int):
+        # Fresh accounts and retries whose backoff has elapsed, in the order they became ready.
+        self.ready: asyncio.Queue[tuple[Account, int] | None] = asyncio.Queue()
+        # Caps how many fresh accounts wait in `ready`, so the source is read lazily.
+        self.fresh_slots = asyncio.Semaphore(concurrency * 2)
+        # Accounts taken from the source that have no final result yet.
+        self.outstanding = 0
+        self.producing = True
+        self.finished = asyncio.Event()
+        self.timers: set[asyncio.TimerHandle] = set()
+
+    def settle(self):
+        self.outstanding -= 1
+        if not self.producing and self.outstanding == 0:
+            self.finished.set()
+
+class SignEngine:
+    """
+    Runs SignModel.sign() for many accounts with at most `concurrency` signs in flight.
+
+    A failure marked retryable (timeout, connection error, 429/5xx) is put back on the
+    ready queue after an exponential backoff with jitter, while the workers carry on with
+    other accounts. Terminal failures (expired cookies, already signed, missing button)
+    are recorded right away. Signs go through bot.sign_scheduler in the bulk lane.
+    """
+    def __init__(self, concurrency: int, max_retries: int = 3, retry_delay: float = 5, max_retry_delay: float = 120):
+        """
+        :param concurrency: Number of accounts signed at the same time.
+        :param max_retries: Attempts per account before a retryable failure is final.
+        :param retry_delay: Backoff before the first retry, doubled for each further one.
+        :param max_retry_delay: Upper bound for a single backoff.
+        """
+        self.concurrency = max(1, int(concurrency))
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Seconds to wait before attempt `attempt + 1`: exponential, with the upper half jittered.
+        """
+        delay = min(self.max_retry_delay, self.retry_delay * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+    async def run(self, accounts: AsyncIterable[Account], stats: SignStats,
+                  on_progress: Callable[[SignStats], Awaitable[None]] | None = None,
+                  on_result: Callable[[Account, dict], Awaitable[None]] | None = None) -> SignStats:
+        """
+        Sign every account and record the outcome in `stats`.
+        Accounts are pulled from `accounts` as workers free up, with only a couple of
+        fresh accounts per worker queued, so signing starts as soon as the first page arrives.
+        `on_result` is awaited with each account's final result (with its "attempts" count),
+        then `on_progress`.
+        """
+        run = _SignRun(self.concurrency)
+        workers = [
+            asyncio.create_task(self._worker(run, stats, on_progress, on_result), name=f"sign-worker-{index}")
+            for index in range(self.concurrency)
+        ]
+        try:
+            async for account in accounts:
+                await run.fresh_slots.acquire()
+                run.outstanding += 1
+                run.ready.put_nowait((account, 1))
+                SIGN_QUEUE_DEPTH.set(run.ready.qsize())
+            run.producing = False
+            if run.outstanding == 0:
+                run.finished.set()
+            await run.finished.wait()
+
+            for _ in workers:
+                run.ready.put_nowait(None)
+            await asyncio.gather(*workers)
+        finally:
+            for timer in run.timers:
+                timer.cancel()
+            for worker in workers:
+                worker.cancel()
+            SIGN_QUEUE_DEPTH.set(0)
+            SIGN_RETRIES_PENDING.set(0)
+        return stats
+
+    def _schedule_retry(self, run: _SignRun, account: Account, attempt: int):
+        delay = self.backoff(attempt)
+        print(f"[Service] Sign failed for {account.username} (attempt {attempt}), retrying in {delay:.1f} seconds...")
+        instant("retry_scheduled", delay=round(delay, 3))
+
+        def requeue():
+            run.timers.discard(timer)
+            run.ready.put_nowait((account, attempt + 1))
+            SIGN_QUEUE_DEPTH.set(run.ready.qsize())
+            SIGN_RETRIES_PENDING.set(len(run.timers))
+
+        timer = asyncio.get_running_loop().call_later(delay, requeue)
+        run.timers.add(timer)
+        SIGN_RETRIES_PENDING.set(len(run.timers))
+
+    async def _worker(self, run: _SignRun, stats: SignStats, on_progress, on_result):
+        while True:
+            item = await run.ready.get()
+            SIGN_QUEUE_DEPTH.set(run.ready.qsize())
+            if item is None:
+                return
+            account, attempt = item
+            if attempt == 1:
+                run.fresh_slots.release()
+            tag(account=account.username, attempt=attempt)
+
+            try:
+                result = await bot.sign_scheduler.sign(account, BULK)
+            except Exception as e:
+                # E.g. a row with unreadable cookies; a dead worker would leave the run waiting forever.
+                print(f"[Service] Sign crashed for {account.username}: {e!r}")
+                result = {"success": False, "retryable": False, "info": f"Error during sign operation: {e}"}
+            if not result.get("success") and result.get("retryable") and attempt < self.max_retries:
+                self._schedule_retry(run, account, attempt)
+                continue
+
+            try:
+                result["attempts"] = attempt
+                stats.record(account, result, attempt)
+                if on_result:
+                    try:
+                        with span("record_result"):
+                            await on_result(account, result)
+                    except Exception as e:
+                        print(f"[Service] Recording result for {account.username} failed: {e}")
+                if on_progress:
+                    try:
+                        await on_progress(stats)
+                    except Exception as e:
+                        print(f"[Service] Progress report failed: {e}")
+            except Exception as e:
+                print(f"[Service] Counting result for {account.username} failed: {e!r}")
+            finally:
+                run.settle()
@@ -0,0 +1,71 @@
+import asyncio
+import random
+import time
+import traceback
+from typing import Awaitable, Callable
+
+from model.MetricsModel import SERVICE_RESTARTS
+
+class ServiceSupervisor:
+    """
+    Keeps one long-running coroutine alive in a single background task.
+
+    When the coroutine raises (or returns, which a service loop never should) it is started
+    again after an exponential backoff with jitter, so a persistent failure does not spin.
+    The backoff starts over once a run has lasted longer than `max_backoff`.
+    """
+    def __init__(self, name: str, run: Callable[[], Awaitable], initial_backoff: float = 1.0, max_backoff: float = 300.0):
+        """
+        :param name: Used in logs, metrics and as the task name.
+        :param run: Creates the coroutine to supervise, called again for every restart.
+        :param initial_backoff: Seconds before the first restart.
+        :param max_backoff: Upper bound the backoff doubles up to.
+        """
+        self.name = name
+        self.run = run
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """
+        Start the task; does nothing while it is already running.
+        """
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._loop(), name=f"{self.name}-service")
+
+    async def stop(self):
+        """
+        Cancel the task and wait for it to unwind.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        print(f"[Service] {self.name} stopped.")
+
+    async def _loop(self):
+        backoff = self.initial_backoff
+        while True:
+            started = time.monotonic()
+            try:
+                await self.run()
+                print(f"[Service] {self.name} returned unexpectedly.")
+            except Exception:
+                print(f"[Service] {self.name} crashed:\n{traceback.format_exc()}")
+            if time.monotonic() - started > self.max_backoff:
+                backoff = self.initial_backoff
+            delay = backoff * random.uniform(0.5, 1.0)
+            SERVICE_RESTARTS.inc(service=self.name)
+            print(f"[Service] Restarting {self.name} in {delay:.1f} seconds.")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, self.max_backoff)
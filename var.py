@@ -1,5 +1,6 @@
 import yaml
 import os
+import time
 
 """
 LOAD/DEFAULT CONFIG
@@ -7,12 +8,36 @@ LOAD/DEFAULT CONFIG
 
 autosign_path = "setup/autosign.yaml"
 config_path = "setup/config.yaml"
+# Hash of the last slash command tree synced to Discord, see bot.sync_command_tree.
+COMMAND_TREE_HASH_PATH = "setup/command_tree.sha256"
+
+# Timed like the phases of bot.startup_phase, which cannot be imported here.
+config_load_started = time.perf_counter()
 
 if not os.path.exists(autosign_path):
     os.makedirs(os.path.dirname(autosign_path), exist_ok=True)
     default_autosign = {
         "scheduled_time": "3:00:00",
-        "check_delay": 5,
+        "sign_window": 30,
+        "concurrency": 5,
+        "page_size": 500,
+        "progress_interval": 5,
+        "flush_interval": 2,
+        "flush_size": 500,
+        "history_days": 90,
+        "shards": 1,
+        "shard_spawn_local": True,
+        "shard_timeout": 3600,
+        "health_check_lead": 30,
+        "notify_dead_accounts": False,
+        "trace_dir": None,
+        "trace_format": "json",
+        "rate_limit": {
+            "rate": 2.0,
+            "min_rate": 0.2,
+            "max_rate": 20.0,
+            "target_latency": 3.0
+        },
         "guild_id": None,
         "channel_id": None
     }
@@ -36,6 +61,8 @@ with open(autosign_path, "r") as file:
 with open(config_path, "r") as file:
     config = yaml.safe_load(file)
 
+print(f"[Startup] config load: {(time.perf_counter() - config_load_started) * 1000:.0f} ms")
+
 """
 STATIC VALUES
 """
@@ -50,8 +77,26 @@ LOGIN_CHECK_URL = "https://bbs.yamibo.com/forum-49-1.html" #文學區首頁
 SIGN_URL = "https://bbs.yamibo.com/plugin.php?id=zqlj_sign"
 
 BOT_TOKEN = config['bot_token']
+HTTP_LIMIT_PER_HOST = config.get("http_limit_per_host", 10)
+ACCOUNT_CACHE_SIZE = config.get("account_cache_size", 1024)
+METRICS_HOST = config.get("metrics_host", "127.0.0.1")
+METRICS_PORT = config.get("metrics_port")
     
 AUTOSIGN_SCHEDULED_TIME = autosign["scheduled_time"]
-AUTOSIGN_CHECK_DELAY = autosign["check_delay"]
+AUTOSIGN_SIGN_WINDOW = autosign.get("sign_window", 30)
+AUTOSIGN_CONCURRENCY = autosign.get("concurrency", 5)
+AUTOSIGN_PAGE_SIZE = autosign.get("page_size", 500)
+AUTOSIGN_RATE_LIMIT = autosign.get("rate_limit") or {}
+AUTOSIGN_PROGRESS_INTERVAL = autosign.get("progress_interval", 5)
+AUTOSIGN_FLUSH_INTERVAL = autosign.get("flush_interval", 2)
+AUTOSIGN_FLUSH_SIZE = autosign.get("flush_size", 500)
+AUTOSIGN_HISTORY_DAYS = autosign.get("history_days", 90)
+AUTOSIGN_SHARDS = autosign.get("shards", 1)
+AUTOSIGN_SHARD_SPAWN_LOCAL = autosign.get("shard_spawn_local", True)
+AUTOSIGN_SHARD_TIMEOUT = autosign.get("shard_timeout", 3600)
+AUTOSIGN_HEALTH_CHECK_LEAD = autosign.get("health_check_lead", 30)
+AUTOSIGN_NOTIFY_DEAD_ACCOUNTS = autosign.get("notify_dead_accounts", False)
+AUTOSIGN_TRACE_DIR = autosign.get("trace_dir")
+AUTOSIGN_TRACE_FORMAT = autosign.get("trace_format", "json")
 AUTOSIGN_NOTIFY_GUILD_ID = autosign["guild_id"]
 AUTOSIGN_NOTIFY_CHANNEL_ID = autosign["channel_id"]
\ No newline at end of file